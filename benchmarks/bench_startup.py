@@ -0,0 +1,84 @@
+import argparse
+import compileall
+import json
+import os
+import platform
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules worker processes and scripts import. None of them may pull in
+# tkinter; sudoku_game only loads it when a window is opened.
+MODULES = ("sudoku_engine", "sudoku_batch", "sudoku_library", "sudoku_cache", "sudoku_service", "sudoku_game")
+PROBE = ("import sys, time\n"
+         "start = time.perf_counter()\n"
+         "import {module}\n"
+         "print(time.perf_counter() - start, 'tkinter' in sys.modules)\n")
+
+
+def measure(module, repeats):
+    # Each sample is a fresh interpreter, as a new worker process would be.
+    samples = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", PROBE.format(module=module)], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.split()
+        samples.append(float(output[0]))
+        if output[1] == "True":
+            return samples, True
+    return samples, False
+
+
+def run(modules, repeats):
+    # Compile first so stale or missing bytecode is not timed (and not
+    # recompiled on every run when PYTHONDONTWRITEBYTECODE is set).
+    compileall.compile_dir(ROOT, maxlevels=0, quiet=1)
+    results = {}
+    for module in modules:
+        samples, loads_tk = measure(module, repeats)
+        samples.sort()
+        results[module] = {"p50": samples[len(samples) // 2], "max": samples[-1], "tkinter": loads_tk}
+        print(f"{module:<16} p50 {samples[len(samples) // 2] * 1000:7.2f} ms  max {samples[-1] * 1000:7.2f} ms"
+              + ("  imports tkinter" if loads_tk else ""))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time importing the engine and headless modules in fresh interpreters.")
+    parser.add_argument("--modules", nargs="+", choices=MODULES, default=list(MODULES))
+    parser.add_argument("--repeats", type=int, default=15)
+    parser.add_argument("--limit", type=float, default=25.0, metavar="MS",
+                        help="Fail when sudoku_engine takes longer than this to import (p50).")
+    parser.add_argument("--output", "-o", help="Write results as JSON to this file.")
+    parser.add_argument("--baseline", help="Compare against a JSON file written by --output.")
+    parser.add_argument("--threshold", type=float, default=1.5, help="Flag p50 slowdowns above this ratio.")
+    args = parser.parse_args(argv)
+
+    results = run(args.modules, args.repeats)
+    failed = False
+    for module, result in results.items():
+        if result["tkinter"]:
+            print(f"FAIL {module} imports tkinter")
+            failed = True
+    engine = results.get("sudoku_engine")
+    if engine and engine["p50"] * 1000 > args.limit:
+        print(f"FAIL sudoku_engine imports in {engine['p50'] * 1000:.2f} ms (limit {args.limit:.2f} ms)")
+        failed = True
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                                "repeats": args.repeats},
+                       "results": results}, file, indent=2, sort_keys=True)
+            file.write("\n")
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        for module, result in results.items():
+            if module in baseline and result["p50"] > baseline[module]["p50"] * args.threshold:
+                print(f"SLOWER {module}: p50 {result['p50'] * 1000:.2f} ms vs {baseline[module]['p50'] * 1000:.2f} ms")
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
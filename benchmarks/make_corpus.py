@@ -0,0 +1,36 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sudoku_batch import generate_one, puzzle_seed
+from sudoku_engine import CLUE_MAP
+
+CORPUS_DIR = os.path.join(ROOT, "benchmarks", "corpus")
+CORPUS_SEED = 2024
+PUZZLES_PER_FILE = 20
+
+
+def corpus_path(size, difficulty):
+    return os.path.join(CORPUS_DIR, f"{size}x{size}_{difficulty.lower()}.txt")
+
+
+def main(argv=None):
+    # Writes corpus files that are missing. Existing files are kept unless
+    # --force is given: timings are only comparable against the same corpus.
+    force = "--force" in (sys.argv[1:] if argv is None else argv)
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    for size, clues_by_difficulty in CLUE_MAP.items():
+        for difficulty, clues in clues_by_difficulty.items():
+            path = corpus_path(size, difficulty)
+            if os.path.exists(path) and not force:
+                continue
+            with open(path, "w") as file:
+                for index in range(PUZZLES_PER_FILE):
+                    index, seed, puzzle, solution, _ = generate_one((size, clues, index, puzzle_seed(CORPUS_SEED, index)))
+                    file.write(f"{puzzle} {solution} {index} {seed}\n")
+
+
+if __name__ == "__main__":
+    main()
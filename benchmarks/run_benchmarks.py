@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sudoku_engine import SudokuBoard, CLUE_MAP, ENGINES
+from make_corpus import corpus_path
+
+BENCHMARKS = ("solve", "count", "generate", "transform", "grade", "hint")
+PERCENTILES = (50, 90, 99)
+
+
+def load_corpus(size, difficulty):
+    with open(corpus_path(size, difficulty)) as file:
+        return [line.split()[0] for line in file if line.strip()]
+
+
+def time_call(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_solve(puzzles, size, clues, engine, rng):
+    samples = []
+    for puzzle in puzzles:
+        board = SudokuBoard.from_string(puzzle, size, engine)
+        samples.append(time_call(board.solve))
+    return samples
+
+
+def bench_count(puzzles, size, clues, engine, rng):
+    samples = []
+    for puzzle in puzzles:
+        board = SudokuBoard.from_string(puzzle, size, engine)
+        samples.append(time_call(board.count_solutions))
+    return samples
+
+
+def bench_generate(puzzles, size, clues, engine, rng):
+    samples = []
+    for _ in puzzles:
+        board = SudokuBoard(size, engine)
+        samples.append(time_call(lambda: (board.generate_full_board(rng), board.remove_numbers(clues, rng=rng))))
+    return samples
+
+
+def bench_transform(puzzles, size, clues, engine, rng):
+    # Deriving a variant from an already validated puzzle, as the pool does.
+    samples = []
+    for puzzle in puzzles:
+        board = SudokuBoard.from_string(puzzle, size, engine)
+        board.count_solutions()
+        samples.append(time_call(lambda: board.transformed(rng)))
+    return samples
+
+
+def bench_grade(puzzles, size, clues, engine, rng):
+    samples = []
+    for puzzle in puzzles:
+        board = SudokuBoard.from_string(puzzle, size, engine)
+        samples.append(time_call(board.grade))
+    return samples
+
+
+def bench_hint(puzzles, size, clues, engine, rng):
+    # A freshly loaded board, so the first hint pays for finding the solution.
+    samples = []
+    for puzzle in puzzles:
+        board = SudokuBoard.from_string(puzzle, size, engine)
+        samples.append(time_call(board.get_hint))
+    return samples
+
+
+BENCH_FUNCS = {
+    "solve": bench_solve,
+    "count": bench_count,
+    "generate": bench_generate,
+    "transform": bench_transform,
+    "grade": bench_grade,
+    "hint": bench_hint,
+}
+
+
+def percentile(sorted_samples, pct):
+    if len(sorted_samples) == 1:
+        return sorted_samples[0]
+    rank = (len(sorted_samples) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_samples) - 1)
+    return sorted_samples[low] + (sorted_samples[high] - sorted_samples[low]) * (rank - low)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    summary = {f"p{pct}": percentile(ordered, pct) for pct in PERCENTILES}
+    summary["mean"] = sum(ordered) / len(ordered)
+    summary["min"] = ordered[0]
+    summary["max"] = ordered[-1]
+    summary["samples"] = len(ordered)
+    return summary
+
+
+def run(benchmarks, sizes, difficulties, engine, repeats, warmup, seed):
+    results = {}
+    for size in sizes:
+        for difficulty in difficulties:
+            puzzles = load_corpus(size, difficulty)
+            clues = CLUE_MAP[size][difficulty]
+            for name in benchmarks:
+                func = BENCH_FUNCS[name]
+                rng = random.Random(seed)
+                for _ in range(warmup):
+                    func(puzzles[:1], size, clues, engine, rng)
+                rng = random.Random(seed)
+                samples = []
+                for _ in range(repeats):
+                    samples.extend(func(puzzles, size, clues, engine, rng))
+                key = f"{name}/{size}x{size}/{difficulty}"
+                results[key] = summarize(samples)
+                print(f"{key:<24} p50 {results[key]['p50'] * 1000:9.3f} ms   "
+                      f"p90 {results[key]['p90'] * 1000:9.3f} ms   p99 {results[key]['p99'] * 1000:9.3f} ms",
+                      file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold, stat="p50"):
+    regressions = []
+    for key, summary in sorted(results.items()):
+        if key not in baseline:
+            continue
+        before = baseline[key][stat]
+        after = summary[stat]
+        ratio = after / before if before else float("inf")
+        marker = "REGRESSION" if ratio > threshold else ""
+        print(f"{key:<24} {before * 1000:9.3f} ms -> {after * 1000:9.3f} ms  x{ratio:5.2f} {marker}", file=sys.stderr)
+        if ratio > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time SudokuBoard solve, count, generate, transform, grade and hint on the checked-in corpus.")
+    parser.add_argument("--benchmarks", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--sizes", nargs="+", type=int, choices=sorted(CLUE_MAP), default=sorted(CLUE_MAP))
+    parser.add_argument("--difficulties", nargs="+", choices=["Easy", "Medium", "Hard"], default=["Easy", "Medium", "Hard"])
+    parser.add_argument("--engine", choices=ENGINES, default="bitmask")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the generate benchmark.")
+    parser.add_argument("--output", "-o", help="Write results as JSON to this file.")
+    parser.add_argument("--baseline", help="Compare against a JSON file written by --output.")
+    parser.add_argument("--threshold", type=float, default=1.5, help="Flag p50 slowdowns above this ratio.")
+    args = parser.parse_args(argv)
+
+    results = run(args.benchmarks, args.sizes, args.difficulties, args.engine, args.repeats, args.warmup, args.seed)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "engine": args.engine,
+            "repeats": args.repeats,
+            "warmup": args.warmup,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write("\n")
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import argparse
+import sys
+
+
+def open_output(path):
+    if path == "-":
+        return sys.stdout
+    return open(path, "w")
+
+
+def run_generate(args):
+    from sudoku_batch import generate_batch, generate_transformed
+    output = open_output(args.output)
+    try:
+        if args.transform:
+            generate_transformed(args.size, args.difficulty, args.count, output, args.transform,
+                                 workers=args.workers, base_seed=args.seed, clues=args.clues)
+        else:
+            generate_batch(args.size, args.difficulty, args.count, output, workers=args.workers,
+                           base_seed=args.seed, clues=args.clues, dedupe=args.dedupe, graded=args.graded)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+def run_solve(args):
+    from sudoku_batch import solve_stream
+    output = open_output(args.output)
+    try:
+        solved, failed = solve_stream(args.input, output, workers=args.workers, chunksize=args.chunksize)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failed else 0
+
+
+def open_input(path):
+    if path == "-":
+        return sys.stdin
+    return open(path)
+
+
+def run_library(args):
+    import sudoku_library
+    if args.action == "create":
+        sudoku_library.PuzzleLibrary.create(args.library, args.max_size).close()
+        return 0
+    writable = args.action in ("import", "remove", "compact")
+    with sudoku_library.PuzzleLibrary(args.library, writable) as library:
+        if args.action == "import":
+            source = open_input(args.input)
+            try:
+                added, rejected = sudoku_library.import_text(library, source, args.difficulty)
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+            print(f"Added {added} puzzles, rejected {rejected}.", file=sys.stderr)
+        elif args.action == "export":
+            output = open_output(args.output)
+            try:
+                if args.grid is not None:
+                    sudoku_library.export_grid(library, args.grid, output)
+                else:
+                    sudoku_library.export_text(library, output)
+            except IndexError as e:
+                print(e, file=sys.stderr)
+                return 1
+            finally:
+                if output is not sys.stdout:
+                    output.close()
+        elif args.action == "get":
+            number = args.number
+            if number is None:
+                number = library.random_number(args.size, args.difficulty)
+                if number is None:
+                    print(f"No {args.size}x{args.size} puzzles in {args.library}.", file=sys.stderr)
+                    return 1
+            try:
+                library.live_entry(number)
+            except IndexError as e:
+                print(e, file=sys.stderr)
+                return 1
+            sudoku_library.export_text(library, sys.stdout, [number])
+        elif args.action == "info":
+            print(f"{len(library)} records, up to {library.max_size}x{library.max_size}, "
+                  f"{library.record_size} bytes each")
+            for (size, difficulty), count in library.counts().items():
+                print(f"{size}x{size} {difficulty or '-'}: {count}")
+        elif args.action == "remove":
+            try:
+                library.remove(args.numbers)
+            except IndexError as e:
+                print(e, file=sys.stderr)
+                return 1
+        elif args.action == "compact":
+            kept, dropped = library.compact(dedupe=not args.keep_duplicates)
+            print(f"Kept {kept} puzzles, dropped {dropped}.", file=sys.stderr)
+    return 0
+
+
+def run_serve(args):
+    from sudoku_service import serve
+    serve(args.socket, args.host, args.port, workers=args.workers, batch_size=args.batch_size,
+          batch_window=args.batch_window / 1000, queue_size=args.queue_size, cache_path=args.cache)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m sudoku", description="Headless Sudoku tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Generate a batch of puzzles across worker processes.")
+    generate.add_argument("--size", type=int, choices=[6, 8, 9, 12, 16, 25], default=9)
+    generate.add_argument("--difficulty", choices=["Easy", "Medium", "Hard"], default="Medium")
+    generate.add_argument("--clues", type=int, help="Override the clue count for the difficulty.")
+    generate.add_argument("--count", type=int, default=100)
+    generate.add_argument("--workers", type=int, help="Worker processes (default: CPU count).")
+    generate.add_argument("--seed", type=int, default=0, help="Base seed; puzzle i uses (seed << 32) + i.")
+    generate.add_argument("--transform", type=int, metavar="SEEDS",
+                          help="Generate SEEDS puzzles and derive the rest from them by symmetry transforms.")
+    generate.add_argument("--graded", action="store_true",
+                          help="Dig to the difficulty's technique grade instead of just its clue count.")
+    generate.add_argument("--dedupe", action="store_true",
+                          help="Skip puzzles equivalent to an earlier one under relabeling and row/column shuffles "
+                               "(normal generation only).")
+    generate.add_argument("--output", "-o", default="-", help="Output file (default: stdout).")
+    generate.set_defaults(func=run_generate)
+
+    solve = commands.add_parser("solve", help="Solve a file of one-line puzzles, writing solutions in input order.")
+    solve.add_argument("input", help="Puzzle file, one puzzle per line (0 or . for blanks), or - for stdin.")
+    solve.add_argument("--workers", type=int, help="Worker processes (default: CPU count).")
+    solve.add_argument("--chunksize", type=int, default=256, help="Puzzles sent to a worker at a time.")
+    solve.add_argument("--output", "-o", default="-", help="Output file (default: stdout).")
+    solve.set_defaults(func=run_solve)
+
+    library = commands.add_parser("library", help="Manage an indexed binary puzzle library.")
+    actions = library.add_subparsers(dest="action", required=True)
+
+    def action(name, help):
+        parser = actions.add_parser(name, help=help)
+        parser.add_argument("library", help="Library file, e.g. puzzles.sdkl.")
+        return parser
+
+    create = action("create", "Create an empty library.")
+    create.add_argument("--max-size", type=int, default=25, help="Largest grid size the records can hold.")
+    add = action("import", "Append puzzles from generate output, one-line puzzles or a sudoku.txt grid.")
+    add.add_argument("input", help="Text file, or - for stdin.")
+    add.add_argument("--difficulty", choices=["Easy", "Medium", "Hard"], help="Tag the imported puzzles.")
+    export = action("export", "Write the library back out as text.")
+    export.add_argument("--grid", type=int, metavar="NUMBER", help="Write puzzle NUMBER as a sudoku.txt grid instead.")
+    export.add_argument("--output", "-o", default="-", help="Output file (default: stdout).")
+    get = action("get", "Print puzzle NUMBER, or a random puzzle of a size and difficulty.")
+    get.add_argument("number", type=int, nargs="?")
+    get.add_argument("--size", type=int, default=9)
+    get.add_argument("--difficulty", choices=["Easy", "Medium", "Hard"])
+    action("info", "Show record counts per size and difficulty.")
+    remove = action("remove", "Mark puzzles as removed; compact reclaims the space.")
+    remove.add_argument("numbers", type=int, nargs="+")
+    compact = action("compact", "Rewrite without removed (and duplicate) puzzles. Numbers change.")
+    compact.add_argument("--keep-duplicates", action="store_true")
+    library.set_defaults(func=run_library)
+
+    serve = commands.add_parser("serve", help="Run a local line-delimited JSON solver/generator service.")
+    where = serve.add_mutually_exclusive_group()
+    where.add_argument("--socket", metavar="PATH", help="Listen on a Unix socket instead of TCP.")
+    where.add_argument("--port", type=int, default=8765, help="TCP port on --host (default: 8765).")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--workers", type=int, help="Worker processes (default: CPU count).")
+    serve.add_argument("--batch-size", type=int, default=32, help="Most requests sent to a worker at a time.")
+    serve.add_argument("--batch-window", type=float, default=2.0, metavar="MS",
+                       help="How long a batch waits to fill (default: 2 ms).")
+    serve.add_argument("--queue-size", type=int, default=1024,
+                       help="Queued requests before the service stops reading from clients.")
+    serve.add_argument("--cache", metavar="PATH", help="sqlite file shared by the workers' solution caches.")
+    serve.set_defaults(func=run_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
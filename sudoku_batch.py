@@ -0,0 +1,194 @@
+import collections
+import concurrent.futures
+import itertools
+import mmap
+import multiprocessing
+import os
+import random
+import sys
+import time
+from sudoku_engine import SudokuBoard, CLUE_MAP, DIGITS, GRADE_TARGETS, dig_puzzle
+from sudoku_transforms import variant_count, canonical_form
+
+
+def puzzle_seed(base_seed, index):
+    return (base_seed << 32) + index
+
+
+def generate_one(task):
+    size, clues, index, seed = task[:4]
+    target = task[4] if len(task) > 4 else None
+    rng = random.Random(seed)
+    board = SudokuBoard(size)
+    # met is False when no attempt reached the clue count (or grade); the
+    # closest attempt is returned and counted as a miss.
+    met = dig_puzzle(board, clues, rng, target)
+    solution = "".join(DIGITS[value - 1] for value in board.solution)
+    return index, seed, board.to_string(), solution, met
+
+
+def generate_batch(size, difficulty, count, output, workers=None, base_seed=0, clues=None, chunksize=16, dedupe=False,
+                   graded=False):
+    if clues is None:
+        clues = CLUE_MAP[size][difficulty]
+    workers = workers or multiprocessing.cpu_count()
+    target = GRADE_TARGETS[difficulty] if graded else None
+    tasks = ((size, clues, index, puzzle_seed(base_seed, index), target) for index in range(count))
+    start = time.perf_counter()
+    if workers == 1:
+        results = map(generate_one, tasks)
+        written, missed = write_results(results, output, dedupe)
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.imap_unordered(generate_one, tasks, chunksize)
+            written, missed = write_results(results, output, dedupe)
+    elapsed = time.perf_counter() - start
+    skipped = f", {count - written - missed} equivalent duplicates skipped" if dedupe else ""
+    print(f"Generated {written} {difficulty} {size}x{size} puzzles with {workers} workers "
+          f"in {elapsed:.2f}s ({written / elapsed if elapsed else 0:.1f}/s){skipped}.", file=sys.stderr)
+    if missed:
+        goal = f"the {difficulty} technique grade" if graded else f"{clues} clues"
+        print(f"Skipped {missed} puzzles that did not reach {goal}.", file=sys.stderr)
+    return written
+
+
+def generate_transformed(size, difficulty, count, output, seeds, workers=None, base_seed=0, clues=None):
+    # Generates `seeds` puzzles normally (the same ones generate_batch would
+    # write first) and derives every output puzzle from one of them by a
+    # random transform. Puzzle i uses the rng seeded with its seed column,
+    # so a run is reproducible for the same --seed and seed count.
+    if clues is None:
+        clues = CLUE_MAP[size][difficulty]
+    workers = workers or multiprocessing.cpu_count()
+    tasks = [(size, clues, index, puzzle_seed(base_seed, index)) for index in range(seeds)]
+    start = time.perf_counter()
+    if workers == 1:
+        results = list(map(generate_one, tasks))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(generate_one, tasks)
+    # Seeds short of the clue count are only used when no seed made it.
+    short = sum(1 for result in results if not result[4])
+    if short:
+        print(f"{short} of {seeds} seeds did not reach {clues} clues.", file=sys.stderr)
+    if short < len(results):
+        results = [result for result in results if result[4]]
+    pool_boards = []
+    for index, seed, puzzle, solution, met in results:
+        board = SudokuBoard.from_string(puzzle, size)
+        board.solution = SudokuBoard.from_string(solution, size).snapshot()
+        pool_boards.append(board)
+    seeded = time.perf_counter()
+    for index in range(count):
+        seed = puzzle_seed(base_seed, index)
+        rng = random.Random(seed)
+        variant = rng.choice(pool_boards).transformed(rng)
+        solution = "".join(DIGITS[value - 1] for value in variant.solution)
+        output.write(f"{variant.to_string()} {solution} {index} {seed}\n")
+    output.flush()
+    elapsed = time.perf_counter() - start
+    variants = variant_count(pool_boards[0].geometry)
+    print(f"Derived {count} {difficulty} {size}x{size} puzzles from {seeds} seeds in {elapsed:.2f}s "
+          f"({seeded - start:.2f}s generating seeds). Each seed yields up to {variants:,} variants.", file=sys.stderr)
+    return count
+
+
+def write_results(results, output, dedupe=False):
+    # Lines are written as workers finish; the index and seed columns let
+    # any puzzle be regenerated exactly with generate_one. Puzzles that
+    # missed their target are skipped and counted. With dedupe, a puzzle
+    # equivalent to one already written (same canonical key) is skipped as
+    # well. Returns (written, missed).
+    written = missed = 0
+    seen = set()
+    for index, seed, puzzle, solution, met in results:
+        if not met:
+            missed += 1
+            continue
+        if dedupe:
+            board = SudokuBoard.from_string(puzzle)
+            key = canonical_form(board.cells, board.geometry)[0]
+            if key in seen:
+                continue
+            seen.add(key)
+        output.write(f"{puzzle} {solution} {index} {seed}\n")
+        written += 1
+    output.flush()
+    return written, missed
+
+
+def iter_puzzles(path):
+    # Yields one puzzle string per non-blank line, taking the first field so
+    # generator output (puzzle solution index seed) can be fed straight back.
+    if path == "-":
+        lines = sys.stdin.buffer
+    elif os.path.getsize(path) == 0:
+        return
+    else:
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from parse_lines(iter(data.readline, b""))
+        return
+    yield from parse_lines(lines)
+
+
+def parse_lines(lines):
+    for line in lines:
+        fields = line.split()
+        if fields and not fields[0].startswith(b"#"):
+            yield fields[0].decode("ascii", "replace")
+
+
+def solve_one(text):
+    try:
+        board = SudokuBoard.from_string(text)
+    except ValueError as e:
+        return f"error: {e}"
+    if not board.solve():
+        return "error: no solution"
+    return board.to_string()
+
+
+def solve_chunk(chunk):
+    return [solve_one(text) for text in chunk]
+
+
+def solve_stream(path, output, workers=None, chunksize=256):
+    # Chunks are submitted in a bounded window and written back strictly in
+    # input order, so memory stays flat no matter how large the input is.
+    workers = workers or multiprocessing.cpu_count()
+    puzzles = iter_puzzles(path)
+    chunks = iter(lambda: list(itertools.islice(puzzles, chunksize)), [])
+    start = time.perf_counter()
+    solved = failed = 0
+    if workers == 1:
+        results = map(solve_chunk, chunks)
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(workers)
+        results = ordered_results(executor, chunks, workers * 2)
+    try:
+        for lines in results:
+            for line in lines:
+                output.write(line + "\n")
+                if line.startswith("error:"):
+                    failed += 1
+                else:
+                    solved += 1
+    finally:
+        if workers != 1:
+            executor.shutdown(cancel_futures=True)
+    output.flush()
+    elapsed = time.perf_counter() - start
+    total = solved + failed
+    print(f"Solved {solved} of {total} puzzles with {workers} workers "
+          f"in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.1f}/s).", file=sys.stderr)
+    return solved, failed
+
+
+def ordered_results(executor, chunks, window):
+    pending = collections.deque()
+    for chunk in chunks:
+        pending.append(executor.submit(solve_chunk, chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
@@ -0,0 +1,117 @@
+import collections
+import os
+import sqlite3
+import sys
+from sudoku_transforms import canonical_form, apply_transform, undo_transform
+
+# Results are cached for the uniqueness question (count_solutions with
+# max_solutions <= 2), so a stored count is 0, 1 or 2 (two or more). The
+# solution is stored in canonical coordinates and only for count 1.
+UNIQUE_LIMIT = 2
+
+
+def default_cache_path():
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.join(os.path.expanduser("~"), "Library", "Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "sudoku", "solutions.sqlite3")
+
+
+class SolutionCache:
+    # Maps the canonical key of a puzzle to its solution count and solution,
+    # so equivalent puzzles (relabeled, rows or columns shuffled) share one
+    # entry. Recent keys live in a bounded LRU; with a path, every result is
+    # also kept in a sqlite file across runs.
+    def __init__(self, capacity=4096, path=None):
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.path = path
+        self.db = None
+        self.hits = 0
+        self.misses = 0
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.db = sqlite3.connect(path)
+            self.db.execute("CREATE TABLE IF NOT EXISTS solutions "
+                            "(key BLOB PRIMARY KEY, count INTEGER NOT NULL, solution BLOB)")
+            self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def lookup(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            return entry
+        if self.db is not None:
+            try:
+                row = self.db.execute("SELECT count, solution FROM solutions WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                self.drop_db(e)
+                return None
+            if row is not None:
+                entry = (row[0], row[1])
+                self.remember(key, entry)
+                return entry
+        return None
+
+    def remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def store(self, key, count, solution):
+        self.remember(key, (count, solution))
+        if self.db is not None:
+            try:
+                self.db.execute("INSERT OR REPLACE INTO solutions (key, count, solution) VALUES (?, ?, ?)",
+                                (key, count, solution))
+                self.db.commit()
+            except sqlite3.Error as e:
+                self.drop_db(e)
+
+    def drop_db(self, error):
+        # A locked, corrupt or read-only file only costs the persistence:
+        # the cache carries on in memory and the error is logged once.
+        # Imported here, like the engine does, to keep startup cheap.
+        import logging
+        logging.getLogger("sudoku").warning("Solution cache %s disabled: %s", self.path, error)
+        try:
+            self.db.close()
+        except sqlite3.Error:
+            pass
+        self.db = None
+
+    def key(self, board):
+        return canonical_form(board.cells, board.geometry)[0]
+
+    def count_solutions(self, board, max_solutions=2):
+        # Drop-in for board.count_solutions(); on a unique result the board's
+        # solution is filled in from the cache as well.
+        if max_solutions > UNIQUE_LIMIT:
+            return board.count_solutions(max_solutions)
+        key, transform = canonical_form(board.cells, board.geometry)
+        entry = self.lookup(key)
+        if entry is not None:
+            self.hits += 1
+            count, solution = entry
+            if count == 1 and board.solution is None:
+                board.solution = undo_transform(solution, transform)
+            return min(count, max_solutions)
+        self.misses += 1
+        count = board.count_solutions(UNIQUE_LIMIT)
+        solution = apply_transform(board.solution, transform) if count == 1 else None
+        self.store(key, count, solution)
+        return min(count, max_solutions)
+
+    def has_unique_solution(self, board):
+        return self.count_solutions(board) == 1
@@ -0,0 +1,607 @@
+import random
+import math
+import functools
+from sudoku_transforms import random_transform, apply_transform
+from sudoku_grader import LogicalGrader, technique_level
+from sudoku_solvers import (BitmaskSolver, DLXSolver, InstrumentedBitmaskSolver, InstrumentedDLXSolver,
+                            SearchStats, StatsRecorder, get_geometry)
+
+ENGINES = ("bitmask", "dlx", "legacy")
+DIGITS = "123456789ABCDEFGHIJKLMNOP"
+CLUE_MAP = {
+    9: {"Easy": 36, "Medium": 30, "Hard": 25},
+    8: {"Easy": 30, "Medium": 25, "Hard": 20},
+    6: {"Easy": 20, "Medium": 16, "Hard": 12},
+    12: {"Easy": 80, "Medium": 70, "Hard": 62},
+    16: {"Easy": 150, "Medium": 130, "Hard": 115},
+    25: {"Easy": 420, "Medium": 380, "Hard": 350}
+}
+# Graded generation: (lowest, highest) level in the grader's technique
+# ladder. Digging keeps every puzzle solvable by the ladder up to `highest`
+# and, from Medium up, stops as soon as it needs a `lowest` technique.
+GRADE_TARGETS = {
+    "Easy": (technique_level("naked single"), technique_level("hidden single")),
+    "Medium": (technique_level("pointing"), technique_level("box-line reduction")),
+    "Hard": (technique_level("naked pair"), technique_level("x-wing")),
+}
+# A single graded dig reaches its target only some of the time (about one
+# in ten for 9x9 Hard), so whole digs are retried. The number of tries
+# scales inversely with the board, which keeps the worst case near a
+# second for 8x8 and 9x9 while large boards, which nearly always reach
+# their target at once, stay at GRADE_ATTEMPTS.
+GRADE_ATTEMPTS = 5
+GRADE_ATTEMPT_CELLS = 4000
+# Fills and digs tried for a clue count alone.
+DIG_ATTEMPTS = 20
+# Search limits for the randomized fill and for each uniqueness check while
+# digging; both scale with the number of cells.
+FILL_NODES_PER_CELL = 4
+FILL_RESTARTS = 50
+DIG_NODES_PER_CELL = 2
+
+def format_value(value):
+    return DIGITS[value - 1] if value else ""
+
+def parse_value(text, size):
+    # Accepts numbers ("12") as well as the digit/letter symbols used for
+    # values above 9 ("C"); returns None for anything else.
+    if text.isdigit():
+        value = int(text)
+    else:
+        value = DIGITS.find(text.upper()) + 1 if len(text) == 1 else 0
+    if 1 <= value <= size:
+        return value
+    return None
+
+def instrumented(operation):
+    # Records a SearchStats for the call when the board has stats enabled.
+    # Nested instrumented calls add to the outer call's stats.
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.stats_recorder is None or self.stats is not None:
+                return method(self, *args, **kwargs)
+            self.stats = SearchStats(operation, self.stats_recorder)
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                stats = self.stats
+                self.stats = None
+                stats.finish()
+        return wrapper
+    return decorate
+
+class SudokuBoard:
+    __slots__ = ("size", "engine", "cells", "subgrid_rows", "subgrid_cols", "geometry", "solution", "_dlx",
+                 "stats", "stats_recorder", "counts", "empty_count", "conflict_count")
+
+    def __init__(self, size, engine="bitmask"):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown solver engine {engine!r}. Use one of: {', '.join(ENGINES)}.")
+        self.size = size
+        self.engine = engine
+        self.cells = bytearray(size * size)
+        self.subgrid_rows, self.subgrid_cols = self.get_subgrid_dimensions()
+        self.geometry = get_geometry(size, self.subgrid_rows, self.subgrid_cols)
+        self.solution = None
+        self._dlx = None
+        self.stats = None
+        self.stats_recorder = None
+        # Digit counts per row, column and box (size + 1 slots per unit,
+        # indexed by value) plus running totals, kept in step with the cells.
+        self.counts = bytearray(3 * size * (size + 1))
+        self.empty_count = size * size
+        self.conflict_count = 0
+
+    def __getstate__(self):
+        # The geometry is shared per shape and the exact-cover links are
+        # rebuilt on demand, so neither is copied.
+        return {"size": self.size, "engine": self.engine, "cells": self.cells, "solution": self.solution}
+
+    def __setstate__(self, state):
+        self.__init__(state["size"], state["engine"])
+        self.cells[:] = state["cells"]
+        self.solution = state["solution"]
+        self.recount()
+
+    def enable_stats(self, callback=None, interval=1000):
+        self.stats_recorder = StatsRecorder(callback, interval)
+        return self.stats_recorder
+
+    def disable_stats(self):
+        self.stats_recorder = None
+
+    @property
+    def last_stats(self):
+        if not self.stats_recorder or not self.stats_recorder.history:
+            return None
+        return self.stats_recorder.history[-1]
+
+    @classmethod
+    def from_string(cls, text, size=None, engine="bitmask"):
+        text = text.strip()
+        if size is None:
+            size = int(round(len(text) ** 0.5))
+        if len(text) != size * size:
+            raise ValueError(f"Expected {size * size} cells for a {size}x{size} puzzle, got {len(text)}.")
+        if size > len(DIGITS):
+            raise ValueError(f"unsupported grid size {size}: values above {len(DIGITS)} have no symbol.")
+        board = cls(size, engine)
+        for k, char in enumerate(text):
+            if char in "0.":
+                continue
+            value = DIGITS.find(char) + 1
+            if not 1 <= value <= size:
+                raise ValueError(f"Invalid value {char!r}. Use 0 or . for empty cells and numbers 1 to grid size.")
+            board.cells[k] = value
+        board.recount()
+        return board
+
+    def to_string(self):
+        return "".join(DIGITS[value - 1] if value else "." for value in self.cells)
+
+    @property
+    def grid(self):
+        size = self.size
+        return [list(self.cells[i * size:(i + 1) * size]) for i in range(size)]
+
+    @grid.setter
+    def grid(self, rows):
+        # A new grid is a new puzzle: the cached solution no longer applies.
+        self.cells[:] = bytes(value for row in rows for value in row)
+        self.solution = None
+        self.recount()
+
+    def snapshot(self):
+        return bytes(self.cells)
+
+    def restore(self, snapshot):
+        # Keeps the cached solution on purpose: snapshots are taken of the
+        # same puzzle (undoing a solve or a dig step). Callers restoring a
+        # different puzzle set board.solution themselves.
+        self.cells[:] = snapshot
+        self.recount()
+
+    def unit_slots(self, cell):
+        stride = self.size + 1
+        geometry = self.geometry
+        return (geometry.cell_row[cell] * stride,
+                (self.size + geometry.cell_col[cell]) * stride,
+                (2 * self.size + geometry.cell_box[cell]) * stride)
+
+    def recount(self):
+        # Rebuilds the unit counts after the cells were written in bulk.
+        counts = self.counts
+        counts[:] = bytes(len(counts))
+        for cell, value in enumerate(self.cells):
+            if value:
+                for slot in self.unit_slots(cell):
+                    counts[slot + value] += 1
+        self.empty_count = self.cells.count(0)
+        self.conflict_count = sum(count - 1 for count in counts if count > 1)
+
+    def put(self, cell, value):
+        # Writes one cell and updates the counts; conflict_count is the
+        # number of surplus copies of a value across all units.
+        old = self.cells[cell]
+        if old == value:
+            return
+        counts = self.counts
+        slots = self.unit_slots(cell)
+        if old:
+            for slot in slots:
+                counts[slot + old] -= 1
+                if counts[slot + old]:
+                    self.conflict_count -= 1
+            self.empty_count += 1
+        if value:
+            for slot in slots:
+                if counts[slot + value]:
+                    self.conflict_count += 1
+                counts[slot + value] += 1
+            self.empty_count -= 1
+        self.cells[cell] = value
+
+    def get_subgrid_dimensions(self):
+        # Boxes are the most square rectangle with at least as many rows as
+        # columns: 9 -> 3x3, 8 -> 4x2, 6 -> 3x2, 12 -> 4x3, 16 -> 4x4, 25 -> 5x5.
+        for rows in range(math.isqrt(self.size), self.size):
+            if rows > 1 and self.size % rows == 0 and rows * rows >= self.size:
+                return rows, self.size // rows
+        raise ValueError(f"unsupported grid size {self.size}: no box shape fits a {self.size}x{self.size} grid.")
+
+    def set_cell(self, row, col, value):
+        if 0 <= row < self.size and 0 <= col < self.size and 0 <= value <= self.size:
+            self.put(row * self.size + col, value)
+            return True
+        return False
+
+    def get_cell(self, row, col):
+        if 0 <= row < self.size and 0 <= col < self.size:
+            return self.cells[row * self.size + col]
+        return None
+
+    def is_valid_move(self, row, col, value):
+        if self.stats is not None:
+            self.stats.valid_move_checks += 1
+        if value == 0:
+            return True
+        cell = row * self.size + col
+        own = self.cells[cell] == value
+        counts = self.counts
+        for slot in self.unit_slots(cell):
+            if counts[slot + value] > own:
+                return False
+        return True
+
+    def in_conflict(self, row, col):
+        cell = row * self.size + col
+        value = self.cells[cell]
+        if not value:
+            return False
+        counts = self.counts
+        for slot in self.unit_slots(cell):
+            if counts[slot + value] > 1:
+                return True
+        return False
+
+    def is_solved(self):
+        return self.empty_count == 0 and self.conflict_count == 0
+
+    def make_solver(self):
+        if self.stats is not None:
+            solver = InstrumentedBitmaskSolver(self.geometry, self.stats)
+        else:
+            solver = BitmaskSolver(self.geometry)
+        if not solver.load(self.cells):
+            return None
+        return solver
+
+    def get_dlx_solver(self):
+        if self.stats is not None:
+            return InstrumentedDLXSolver(self.geometry, self.stats)
+        if self._dlx is None:
+            self._dlx = DLXSolver(self.geometry)
+        return self._dlx
+
+    @instrumented("solve")
+    def solve(self):
+        if self.engine == "legacy":
+            return self.solve_legacy()
+        if self.engine == "dlx":
+            solution = self.get_dlx_solver().solve(self.cells)
+        else:
+            solver = self.make_solver()
+            solution = solver.solve() if solver else None
+        if solution is None:
+            return False
+        self.cells[:] = bytes(solution)
+        self.recount()
+        return True
+
+    def solve_legacy(self):
+        empty = self.find_empty()
+        if not empty:
+            return True
+        row, col = empty
+        stats = self.stats
+        for value in range(1, self.size + 1):
+            if self.is_valid_move(row, col, value):
+                self.set_cell(row, col, value)
+                if stats is not None:
+                    stats.enter()
+                solved = self.solve_legacy()
+                if stats is not None:
+                    stats.leave(solved)
+                if solved:
+                    return True
+                self.set_cell(row, col, 0)
+        return False
+
+    def find_empty(self):
+        cell = self.cells.find(0)
+        if cell < 0:
+            return None
+        return divmod(cell, self.size)
+
+    def get_hint(self, row=None, col=None):
+        if row is None or col is None:
+            # Original behavior for sequential hints
+            empty = self.find_empty()
+            if not empty:
+                return None
+            row, col = empty
+        elif self.get_cell(row, col) != 0:
+            return None
+        solution = self.get_solution()
+        if solution is None:
+            return None
+        return (row, col, solution[row * self.size + col])
+
+    def get_solution(self):
+        if self.solution is None:
+            self.count_solutions()
+        if self.solution is not None:
+            return self.solution
+        # Several solutions: hint from any one of them, without caching it.
+        snapshot = self.snapshot()
+        solution = self.snapshot() if self.solve() else None
+        self.restore(snapshot)
+        return solution
+
+    def find_mistakes(self):
+        if self.solution is None:
+            return []
+        size = self.size
+        return [divmod(cell, size) for cell, value in enumerate(self.cells)
+                if value != 0 and value != self.solution[cell]]
+
+    def remember_solution(self, count, max_solutions, solution):
+        # Only a count that proved uniqueness pins down the solution.
+        if count == 1 and max_solutions >= 2:
+            self.solution = bytes(solution)
+
+    @instrumented("count_solutions")
+    def count_solutions(self, max_solutions=2):
+        if self.engine == "legacy":
+            return self.count_solutions_legacy(max_solutions)
+        if self.engine == "dlx":
+            solver = self.get_dlx_solver()
+            count = solver.count(self.cells, max_solutions)
+            if count == 1:
+                self.remember_solution(count, max_solutions, solver.solution_cells(self.cells))
+            return count
+        solver = self.make_solver()
+        if not solver:
+            return 0
+        count = solver.count(max_solutions)
+        if count == 1:
+            self.remember_solution(count, max_solutions, solver.solution)
+        return count
+
+    def has_unique_solution(self):
+        return self.count_solutions(max_solutions=2) == 1
+
+    def count_solutions_legacy(self, max_solutions=2):
+        count = [0]
+        first = []
+        stats = self.stats
+        def solver():
+            if count[0] >= max_solutions:
+                return
+            empty = self.find_empty()
+            if not empty:
+                count[0] += 1
+                if not first:
+                    first.append(self.snapshot())
+                return
+            row, col = empty
+            for value in range(1, self.size + 1):
+                if self.is_valid_move(row, col, value):
+                    self.set_cell(row, col, value)
+                    if stats is not None:
+                        found = count[0]
+                        stats.enter()
+                        solver()
+                        stats.leave(count[0] > found)
+                    else:
+                        solver()
+                    self.set_cell(row, col, 0)
+                    if count[0] >= max_solutions:
+                        return
+        solver()
+        if count[0] == 1:
+            self.remember_solution(count[0], max_solutions, first[0])
+        return count[0]
+
+    @instrumented("generate_full_board")
+    def generate_full_board(self, rng=None):
+        rng = rng or random
+        self.cells[:] = bytes(len(self.cells))
+        if self.engine == "legacy":
+            filled = self.fill_board_legacy(rng)
+        else:
+            filled = self.fill_board_random(rng)
+        self.recount()
+        if not filled:
+            return False
+        self.solution = self.snapshot()
+        return True
+
+    def fill_board_random(self, rng):
+        # Randomized constraint-propagation fill. A run that exceeds its node
+        # budget restarts with fresh random choices instead of thrashing.
+        solver = self.make_solver()
+        for _ in range(FILL_RESTARTS):
+            solution = solver.fill(rng, FILL_NODES_PER_CELL * len(self.cells))
+            if solution:
+                self.cells[:] = bytes(solution)
+                return True
+        return False
+
+    def fill_board_legacy(self, rng):
+        stats = self.stats
+        cells = self.cells
+        peers = self.geometry.peers
+        numbers = list(range(1, self.size + 1))
+        rng.shuffle(numbers)
+        
+        def fill_board(cell):
+            if cell >= len(cells):
+                return True
+                
+            if cells[cell] != 0:
+                return fill_board(cell + 1)
+                
+            rng.shuffle(numbers)
+            used = {cells[peer] for peer in peers[cell]}
+            for value in numbers:
+                if stats is not None:
+                    stats.valid_move_checks += 1
+                if value not in used:
+                    cells[cell] = value
+                    if stats is not None:
+                        stats.enter()
+                    filled = fill_board(cell + 1)
+                    if stats is not None:
+                        stats.leave(filled)
+                    if filled:
+                        return True
+                    cells[cell] = 0
+            return False
+            
+        return fill_board(0)
+
+    def grade(self):
+        return LogicalGrader(self.geometry).grade(self.cells)
+
+    @instrumented("remove_numbers")
+    def remove_numbers(self, clues, incremental=True, rng=None, target=None):
+        rng = rng or random
+        cells = list(range(self.size * self.size))
+        rng.shuffle(cells)
+        total_to_remove = self.size * self.size - clues
+        if self.engine == "legacy" or not incremental:
+            return self.remove_numbers_full(cells, total_to_remove)
+        # Dig against the solved grid: each removal only has to prove that
+        # the blanked cell cannot take another value.
+        solver = self.make_solver()
+        if not solver or solver.count(2) != 1:
+            return total_to_remove <= 0
+        solution = solver.solution
+        if self.solution is None:
+            self.solution = bytes(solution)
+        budget = DIG_NODES_PER_CELL * len(self.cells)
+        # With engine="dlx" the uniqueness checks go through Dancing Links;
+        # the bitmask solver still tracks the digging.
+        dlx = self.get_dlx_solver() if self.engine == "dlx" else None
+        removed = []
+        position = 0
+        while position < len(cells) and len(removed) < total_to_remove:
+            cell = cells[position]
+            position += 1
+            if self.dig_cell(solver, cell, solution[cell], budget, dlx):
+                removed.append(cell)
+        if not target:
+            return len(removed) == total_to_remove
+        # Graded digging. Removing clues never makes the ladder's job easier,
+        # so when the dug puzzle is past the target, the longest acceptable
+        # run of removals is found by bisection instead of grading each one.
+        lowest, highest = target
+        grader = LogicalGrader(self.geometry)
+        grade = grader.grade(self.cells)
+        if not grade.solved or grade.level > highest:
+            good, bad = 0, len(removed)
+            while bad - good > 1:
+                middle = (good + bad) // 2
+                for k, cell in enumerate(removed):
+                    self.put(cell, 0 if k < middle else solution[cell])
+                grade = grader.grade(self.cells)
+                if grade.solved and grade.level <= highest:
+                    good = middle
+                else:
+                    bad = middle
+            for k, cell in enumerate(removed):
+                self.put(cell, 0 if k < good else solution[cell])
+            del removed[good:]
+            solver.load(self.cells)
+            grade = grader.grade(self.cells)
+        if grade.level >= lowest and (lowest > 0 or len(removed) >= total_to_remove):
+            return True
+        # Too easy (or short of the clue count): keep digging the untried
+        # cells one at a time and stop as soon as the target is reached.
+        for cell in cells[position:]:
+            value = solution[cell]
+            if not self.dig_cell(solver, cell, value, budget, dlx):
+                continue
+            grade = grader.grade(self.cells)
+            if not grade.solved or grade.level > highest:
+                self.put(cell, value)
+                solver.place(cell, 1 << (value - 1))
+                continue
+            removed.append(cell)
+            if grade.level >= lowest and (lowest > 0 or len(removed) >= total_to_remove):
+                return True
+        return False
+
+    def dig_cell(self, solver, cell, value, budget, dlx=None):
+        # Blanks the cell if that keeps the solution unique.
+        if self.cells[cell] == 0:
+            return False
+        solver.clear(cell)
+        if dlx is not None:
+            other = dlx.has_other_solution(self.cells, cell, value)
+        else:
+            other = solver.has_other_solution(cell, value, budget)
+        if other:
+            solver.place(cell, 1 << (value - 1))
+            return False
+        self.put(cell, 0)
+        return True
+
+    def remove_numbers_full(self, cells, total_to_remove):
+        removed = 0
+        for cell in cells:
+            if removed >= total_to_remove:
+                break
+            value = self.cells[cell]
+            if value == 0:
+                continue
+            self.put(cell, 0)
+            snapshot = self.snapshot()
+            unique = self.count_solutions() == 1
+            self.restore(snapshot)
+            if unique:
+                removed += 1
+            else:
+                self.put(cell, value)
+        return removed == total_to_remove
+
+    def transformed(self, rng=None):
+        # A fresh-looking puzzle with the same difficulty, derived by
+        # relabeling and row/column shuffles; nothing has to be solved.
+        if self.solution is None and self.count_solutions() != 1:
+            raise ValueError("Puzzle does not have exactly one solution.")
+        transform = random_transform(self.geometry, rng)
+        board = SudokuBoard(self.size, self.engine)
+        board.restore(apply_transform(self.cells, transform))
+        board.solution = apply_transform(self.solution, transform)
+        return board
+
+def grade_attempts(size):
+    return max(GRADE_ATTEMPTS, GRADE_ATTEMPT_CELLS // (size * size))
+
+def dig_puzzle(board, clues, rng=None, target=None):
+    # Fills and digs the board until it reaches the clue count and, with a
+    # target, the grade. Returns False when every attempt missed; the board
+    # then holds the closest attempt (the hardest grade, or the fewest
+    # clues), never simply the last one.
+    best = None
+    for _ in range(grade_attempts(board.size) if target else DIG_ATTEMPTS):
+        board.generate_full_board(rng)
+        if board.remove_numbers(clues, rng=rng, target=target):
+            return True
+        if target:
+            grade = board.grade()
+            rank = (grade.solved, grade.level, grade.score)
+        else:
+            rank = board.empty_count
+        if best is None or rank > best[0]:
+            best = (rank, board.snapshot(), board.solution)
+    board.restore(best[1])
+    board.solution = best[2]
+    return False
+
+def generate_puzzle_board(size, difficulty, rng=None, stats=False):
+    board = SudokuBoard(size)
+    if stats:
+        board.enable_stats()
+    dig_puzzle(board, CLUE_MAP[size][difficulty], rng, GRADE_TARGETS[difficulty])
+    if stats:
+        # Imported here: logging alone costs more than the rest of the engine
+        # at startup, and worker processes rarely enable stats.
+        import logging
+        logger = logging.getLogger("sudoku")
+        for entry in board.stats_recorder.history:
+            logger.info("%d x %d %s %s", size, size, difficulty, entry.summary())
+    return board
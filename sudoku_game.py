@@ -1,171 +1,167 @@
-import tkinter as tk
-from tkinter import messagebox
 import random
-import copy
 import os
+import logging
+import queue
+import struct
+import threading
+from sudoku_engine import (ENGINES, DIGITS, CLUE_MAP, GRADE_TARGETS, GRADE_ATTEMPTS, SudokuBoard,
+                           format_value, parse_value, generate_puzzle_board)
 
-class SudokuBoard:
-    def __init__(self, size):
-        self.size = size
-        self.grid = [[0 for _ in range(size)] for _ in range(size)]
-        self.subgrid_rows, self.subgrid_cols = self.get_subgrid_dimensions()
-
-    def get_subgrid_dimensions(self):
-        if self.size == 9:
-            return 3, 3
-        elif self.size == 8:
-            return 4, 2
-        elif self.size == 6:
-            return 3, 2
-        return 1, 1
-
-    def set_cell(self, row, col, value):
-        if 0 <= row < self.size and 0 <= col < self.size and 0 <= value <= self.size:
-            self.grid[row][col] = value
-            return True
-        return False
-
-    def get_cell(self, row, col):
-        if 0 <= row < self.size and 0 <= col < self.size:
-            return self.grid[row][col]
+# The engine lives in sudoku_engine and is re-exported here for older
+# imports. Tk is only imported once a window is opened, so importing this
+# module stays cheap and works on machines without a display.
+__all__ = ["ENGINES", "DIGITS", "CLUE_MAP", "GRADE_TARGETS", "GRADE_ATTEMPTS", "SudokuBoard",
+           "format_value", "parse_value", "generate_puzzle_board",
+           "PuzzlePool", "CanvasBoardView", "SudokuGUI", "load_tk"]
+
+tk = messagebox = ttk = None
+
+SIZE_OPTIONS = {"9x9": 9, "8x8": 8, "6x6": 6, "12x12": 12, "16x16": 16, "25x25": 25}
+CELL_SIZES = {6: 50, 8: 40, 9: 36, 12: 40, 16: 34, 25: 26}
+CELL_FONT_SIZES = {6: 16, 8: 16, 9: 16, 12: 14, 16: 12, 25: 9}
+HIGHLIGHT_COLOR = "#add8e6"
+SELECTED_COLOR = "#7fb3d5"
+CONFLICT_COLOR = "#f4b6b6"
+
+logger = logging.getLogger("sudoku")
+DEBUG_STATS = bool(os.environ.get("SUDOKU_DEBUG"))
+LIBRARY_FILE = os.environ.get("SUDOKU_LIBRARY", "puzzles.sdkl")
+SOLUTION_CACHE_FILE = os.environ.get("SUDOKU_CACHE")
+
+def load_tk():
+    global tk, messagebox, ttk
+    if tk is None:
+        import tkinter
+        from tkinter import messagebox as tk_messagebox, ttk as tk_ttk
+        tk, messagebox, ttk = tkinter, tk_messagebox, tk_ttk
+
+class PuzzlePool:
+    # Keeps a few ready puzzles per (size, difficulty) so new games do not
+    # have to wait for generation. A single daemon thread refills the most
+    # recently wanted keys first. Generated puzzles are also kept as seeds:
+    # when a queue runs dry, a transformed variant of a seed is handed out.
+    def __init__(self, capacity=2, seeds=4):
+        self.capacity = capacity
+        self.seed_capacity = seeds
+        self.queues = {}
+        self.seeds = {}
+        self.wanted = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def want(self, size, difficulty):
+        key = (size, difficulty)
+        with self.lock:
+            if key in self.wanted:
+                self.wanted.remove(key)
+            self.wanted.insert(0, key)
+            self.queues.setdefault(key, queue.Queue(self.capacity))
+        self.wakeup.set()
+
+    def get(self, size, difficulty):
+        self.want(size, difficulty)
+        try:
+            return self.queues[(size, difficulty)].get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            seeds = self.seeds.get((size, difficulty))
+            seed = random.choice(seeds) if seeds else None
+        return seed.transformed() if seed else None
+
+    def next_key(self):
+        with self.lock:
+            for key in self.wanted:
+                if not self.queues[key].full():
+                    return key
         return None
 
-    def is_valid_move(self, row, col, value):
-        if value == 0:
-            return True
-        for i in range(self.size):
-            if i != col and self.grid[row][i] == value:
-                return False
-        for i in range(self.size):
-            if i != row and self.grid[i][col] == value:
-                return False
-        start_row = (row // self.subgrid_rows) * self.subgrid_rows
-        start_col = (col // self.subgrid_cols) * self.subgrid_cols
-        for i in range(start_row, start_row + self.subgrid_rows):
-            for j in range(start_col, start_col + self.subgrid_cols):
-                if (i != row or j != col) and self.grid[i][j] == value:
-                    return False
-        return True
-
-    def solve(self):
-        empty = self.find_empty()
-        if not empty:
-            return True
-        row, col = empty
-        for value in range(1, self.size + 1):
-            if self.is_valid_move(row, col, value):
-                self.set_cell(row, col, value)
-                if self.solve():
-                    return True
-                self.set_cell(row, col, 0)
-        return False
-
-    def find_empty(self):
+    def run(self):
+        rng = random.Random()
+        while True:
+            key = self.next_key()
+            if key is None:
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            board = generate_puzzle_board(*key, rng=rng, stats=DEBUG_STATS)
+            # The queued board is played on, so the seed is a variant of it.
+            variant = board.transformed(rng)
+            with self.lock:
+                seeds = self.seeds.setdefault(key, [])
+                if len(seeds) >= self.seed_capacity:
+                    seeds.pop(0)
+                seeds.append(variant)
+            try:
+                self.queues[key].put_nowait(board)
+            except queue.Full:
+                pass
+
+class CanvasBoardView:
+    # Draws the whole grid on one Canvas. Every cell remembers the state it
+    # was last drawn with and update_cell only reconfigures the canvas items
+    # whose text, colors or weight actually change.
+    MARGIN = 3
+
+    def __init__(self, parent, board, cell_size, font_size):
+        self.size = board.size
+        self.cell_size = cell_size
+        self.fonts = (("Arial", font_size), ("Arial", font_size, "bold"))
+        extent = self.size * cell_size + 2 * self.MARGIN
+        self.canvas = tk.Canvas(parent, width=extent, height=extent, bg="white", highlightthickness=0, takefocus=1)
+        self.rects = {}
+        self.texts = {}
+        self.state = {}
         for i in range(self.size):
             for j in range(self.size):
-                if self.grid[i][j] == 0:
-                    return (i, j)
-        return None
+                x = self.MARGIN + j * cell_size
+                y = self.MARGIN + i * cell_size
+                self.rects[(i, j)] = self.canvas.create_rectangle(x, y, x + cell_size, y + cell_size, fill="white", outline="#b0b0b0")
+                self.texts[(i, j)] = self.canvas.create_text(x + cell_size / 2, y + cell_size / 2, text="", fill="black", font=self.fonts[0])
+                self.state[(i, j)] = ("", "black", "white", False)
+        end = self.MARGIN + self.size * cell_size
+        for k in range(0, self.size + 1, board.subgrid_cols):
+            x = self.MARGIN + k * cell_size
+            self.canvas.create_line(x, self.MARGIN, x, end, width=3 if k % self.size == 0 else 2)
+        for k in range(0, self.size + 1, board.subgrid_rows):
+            y = self.MARGIN + k * cell_size
+            self.canvas.create_line(self.MARGIN, y, end, y, width=3 if k % self.size == 0 else 2)
 
-    def get_hint(self, row=None, col=None):
-        if row is not None and col is not None:
-            # If specific cell is provided, get hint for that cell
-            if self.grid[row][col] != 0:
-                return None
-            for value in range(1, self.size + 1):
-                if self.is_valid_move(row, col, value):
-                    temp_board = copy.deepcopy(self)
-                    temp_board.set_cell(row, col, value)
-                    if temp_board.solve():
-                        return (row, col, value)
-            return None
-        else:
-            # Original behavior for sequential hints
-            empty = self.find_empty()
-            if not empty:
-                return None
-            row, col = empty
-            for value in range(1, self.size + 1):
-                if self.is_valid_move(row, col, value):
-                    temp_board = copy.deepcopy(self)
-                    temp_board.set_cell(row, col, value)
-                    if temp_board.solve():
-                        return (row, col, value)
-            return None
+    def update_cell(self, row, col, text=None, fg=None, bg=None, bold=None):
+        old = self.state[(row, col)]
+        new = (old[0] if text is None else text,
+               old[1] if fg is None else fg,
+               old[2] if bg is None else bg,
+               old[3] if bold is None else bold)
+        if new == old:
+            return
+        if new[2] != old[2]:
+            self.canvas.itemconfig(self.rects[(row, col)], fill=new[2])
+        if new[:2] != old[:2] or new[3] != old[3]:
+            self.canvas.itemconfig(self.texts[(row, col)], text=new[0], fill=new[1], font=self.fonts[new[3]])
+        self.state[(row, col)] = new
 
-    def count_solutions(self, max_solutions=2):
-        count = [0]
-        def solver():
-            if count[0] >= max_solutions:
-                return
-            empty = self.find_empty()
-            if not empty:
-                count[0] += 1
-                return
-            row, col = empty
-            for value in range(1, self.size + 1):
-                if self.is_valid_move(row, col, value):
-                    self.set_cell(row, col, value)
-                    solver()
-                    self.set_cell(row, col, 0)
-                    if count[0] >= max_solutions:
-                        return
-        solver()
-        return count[0]
-
-    def generate_full_board(self):
-        self.grid = [[0 for _ in range(self.size)] for _ in range(self.size)]
-        numbers = list(range(1, self.size + 1))
-        random.shuffle(numbers)
-        
-        def fill_board(row, col):
-            if col >= self.size:
-                row += 1
-                col = 0
-            if row >= self.size:
-                return True
-                
-            if self.grid[row][col] != 0:
-                return fill_board(row, col + 1)
-                
-            random.shuffle(numbers)
-            for value in numbers:
-                if self.is_valid_move(row, col, value):
-                    self.grid[row][col] = value
-                    if fill_board(row, col + 1):
-                        return True
-                    self.grid[row][col] = 0
-            return False
-            
-        return fill_board(0, 0)
-
-    def remove_numbers(self, clues):
-        cells = [(i, j) for i in range(self.size) for j in range(self.size)]
-        random.shuffle(cells)
-        removed = 0
-        total_to_remove = self.size * self.size - clues
-        for row, col in cells:
-            if removed >= total_to_remove:
-                break
-            value = self.grid[row][col]
-            if value == 0:
-                continue
-            self.grid[row][col] = 0
-            temp_board = copy.deepcopy(self)
-            if temp_board.count_solutions() == 1:
-                removed += 1
-            else:
-                self.grid[row][col] = value
-        return removed == total_to_remove
+    def cell_at(self, x, y):
+        row = int((y - self.MARGIN) // self.cell_size)
+        col = int((x - self.MARGIN) // self.cell_size)
+        if 0 <= row < self.size and 0 <= col < self.size:
+            return row, col
+        return None
 
 class SudokuGUI:
     def __init__(self, root):
+        load_tk()
         self.root = root
         self.root.title("Sudoku Game")
         self.root.geometry("600x600")
         self.center_window()
         self.board = None
-        self.cells = {}
+        self.view = None
+        self.highlighted = set()
+        self.marked = set()
+        self.conflicts = set()
         self.selected_cell = None
         self.original_cells = set()
         self.wrong_count = 3
@@ -179,12 +175,23 @@ class SudokuGUI:
         self.load_game_var = tk.BooleanVar(value=False)
         self.wrong_count_label = None
         self.hint_count_label = None
+        self.debug_label = None
+        self.progress_frame = None
+        self.generating = False
+        self.puzzle_pool = PuzzlePool()
+        self.library = None
+        self.solution_cache = None
+        self.difficulty_var.trace_add("write", self.prefetch_puzzles)
+        self.grid_size_var.trace_add("write", self.prefetch_puzzles)
+        self.prefetch_puzzles()
         self.show_welcome_screen()
 
-    def center_window(self):
+    def prefetch_puzzles(self, *args):
+        size = SIZE_OPTIONS[self.grid_size_var.get()]
+        self.puzzle_pool.want(size, self.difficulty_var.get())
+
+    def center_window(self, width=600, height=600):
         self.root.update_idletasks()
-        width = 600
-        height = 600
         screen_width = self.root.winfo_screenwidth()
         screen_height = self.root.winfo_screenheight()
         x = (screen_width - width) // 2
@@ -200,12 +207,16 @@ class SudokuGUI:
         self.clear_content()
         # Reset game state
         self.board = None
-        self.cells.clear()
+        self.view = None
+        self.highlighted.clear()
+        self.marked.clear()
+        self.conflicts.clear()
         self.selected_cell = None
         self.original_cells.clear()
         self.wrong_count = 3
         self.hint_count = 0
         
+        self.center_window()
         self.current_content = tk.Frame(self.main_frame, bg="#f0f0f0", width=600, height=600)
         self.current_content.place(relx=0.5, rely=0.5, anchor="center")
         tk.Label(self.current_content, text="Welcome to Sudoku!", font=("Arial", 16, "bold"), bg="#f0f0f0").pack(pady=20)
@@ -214,7 +225,7 @@ class SudokuGUI:
         difficulty_menu.config(bg="#add8e6", font=("Arial", 12))
         difficulty_menu.pack(pady=5)
         tk.Label(self.current_content, text="Grid Size:", bg="#f0f0f0", font=("Arial", 12)).pack()
-        grid_size_menu = tk.OptionMenu(self.current_content, self.grid_size_var, "9x9", "8x8", "6x6")
+        grid_size_menu = tk.OptionMenu(self.current_content, self.grid_size_var, *SIZE_OPTIONS)
         grid_size_menu.config(bg="#add8e6", font=("Arial", 12))
         grid_size_menu.pack(pady=5)
         tk.Checkbutton(self.current_content, text="Load an existing game from sudoku.txt", variable=self.load_game_var, bg="#f0f0f0", font=("Arial", 12)).pack(pady=5)
@@ -229,8 +240,9 @@ class SudokuGUI:
             with open(filename, 'r') as file:
                 lines = [line.strip().split() for line in file if line.strip()]
             size = len(lines)
-            if size not in [6, 8, 9] or any(len(row) != size for row in lines):
-                messagebox.showerror("Error", "Invalid grid size in sudoku.txt. Must be 6x6, 8x8, or 9x9.")
+            if size not in CLUE_MAP or any(len(row) != size for row in lines):
+                sizes = ", ".join(f"{n}x{n}" for n in sorted(CLUE_MAP))
+                messagebox.showerror("Error", f"Invalid grid size in sudoku.txt. Must be one of {sizes}.")
                 return None
             grid = []
             for row in lines:
@@ -238,8 +250,8 @@ class SudokuGUI:
                 for val in row:
                     if val == '0' or val == '.':
                         grid_row.append(0)
-                    elif val.isdigit() and 1 <= int(val) <= size:
-                        grid_row.append(int(val))
+                    elif parse_value(val, size):
+                        grid_row.append(parse_value(val, size))
                     else:
                         messagebox.showerror("Error", "Invalid value in sudoku.txt. Use 0 or . for empty cells and numbers 1 to grid size.")
                         return None
@@ -248,7 +260,7 @@ class SudokuGUI:
             for i in range(size):
                 for j in range(size):
                     board.set_cell(i, j, grid[i][j])
-            if board.count_solutions() != 1:
+            if self.get_solution_cache().count_solutions(board) != 1:
                 messagebox.showerror("Error", "Puzzle in sudoku.txt does not have exactly one solution.")
                 return None
             return board
@@ -256,6 +268,20 @@ class SudokuGUI:
             messagebox.showerror("Error", f"Failed to load sudoku.txt: {str(e)}")
             return None
 
+    def get_solution_cache(self):
+        # Uniqueness results and solutions of loaded puzzles persist between
+        # runs, keyed by canonical form, so reloading a puzzle (or a relabeled
+        # or shuffled copy of it) does not solve it again.
+        if self.solution_cache is None:
+            import sqlite3
+            from sudoku_cache import SolutionCache, default_cache_path
+            try:
+                self.solution_cache = SolutionCache(path=SOLUTION_CACHE_FILE or default_cache_path())
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Solution cache disabled on disk: %s", e)
+                self.solution_cache = SolutionCache()
+        return self.solution_cache
+
     def save_puzzle_to_file(self, filename="sudoku.txt"):
         if not self.board:
             messagebox.showerror("Error", "No active game to save.")
@@ -270,6 +296,8 @@ class SudokuGUI:
             messagebox.showerror("Error", f"Failed to save to sudoku.txt: {str(e)}")
 
     def start_game(self):
+        if self.generating:
+            return
         try:
             self.wrong_count = 3
             self.hint_count = 0
@@ -279,13 +307,10 @@ class SudokuGUI:
                     return
                 self.board = board
                 self.grid_size_var.set(f"{board.size}x{board.size}")
+                self.show_game_screen()
+                self.update_grid()
             else:
-                grid_size = self.grid_size_var.get()
-                size_map = {"9x9": 9, "8x8": 8, "6x6": 6}
-                self.board = SudokuBoard(size_map[grid_size])
                 self.generate_puzzle()
-            self.show_game_screen()
-            self.update_grid()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to start game: {str(e)}")
             self.show_welcome_screen()
@@ -296,34 +321,31 @@ class SudokuGUI:
         self.current_content.place(relx=0.5, rely=0.5, anchor="center")
         grid_frame = tk.Frame(self.current_content, bg="#f0f0f0")
         grid_frame.pack(side=tk.LEFT, padx=20, pady=20)
-        cell_size = 50 if self.grid_size_var.get() == "6x6" else 40 if self.grid_size_var.get() == "8x8" else 35
-        size = {"9x9": 9, "8x8": 8, "6x6": 6}[self.grid_size_var.get()]
-        subgrid_rows, subgrid_cols = (3, 3) if size == 9 else (4, 2) if size == 8 else (3, 2)
-        self.cells.clear()
-        for i in range(size):
-            for j in range(size):
-                cell = tk.Entry(
-                    grid_frame,
-                    width=2,
-                    font=("Arial", 16),
-                    justify="center",
-                    bg="white",
-                    fg="black",
-                    borderwidth=1,
-                    relief="solid"
-                )
-                cell.grid(row=i, column=j, padx=1, pady=1, ipady=cell_size//4)
-                cell.bind("<Button-1>", lambda e, r=i, c=j: self.select_cell(r, c))
-                cell.bind("<Key>", self.handle_key)
-                self.cells[(i, j)] = cell
+        size = self.board.size
+        if size > 9:
+            self.center_window(900, 800)
+        self.selected_cell = None
+        self.highlighted.clear()
+        self.marked.clear()
+        self.conflicts.clear()
+        self.view = CanvasBoardView(grid_frame, self.board, CELL_SIZES[size], CELL_FONT_SIZES[size])
+        self.view.canvas.pack()
+        self.view.canvas.bind("<Button-1>", self.handle_click)
+        self.view.canvas.bind("<Key>", self.handle_key)
+        for keysym, step in (("<Up>", (-1, 0)), ("<Down>", (1, 0)), ("<Left>", (0, -1)), ("<Right>", (0, 1))):
+            self.view.canvas.bind(keysym, lambda e, step=step: self.move_selection(*step))
         control_frame = tk.Frame(self.current_content, bg="#f0f0f0", width=150)
         control_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=20, pady=20)
         self.wrong_count_label = tk.Label(control_frame, text=f"Wrong Attempts Left: {self.wrong_count}", bg="#f0f0f0", font=("Arial", 12))
         self.wrong_count_label.pack(pady=5)
         self.hint_count_label = tk.Label(control_frame, text=f"Hints Used: {self.hint_count}/{self.max_hints}", bg="#f0f0f0", font=("Arial", 12))
         self.hint_count_label.pack(pady=5)
+        if DEBUG_STATS:
+            self.debug_label = tk.Label(control_frame, text="", bg="#f0f0f0", fg="#555555", font=("Arial", 8), justify="left", wraplength=150)
+            self.debug_label.pack(side=tk.BOTTOM, pady=5)
         buttons = [
             ("Hint", self.get_hint, "#ff9800"),
+            ("Check", self.check_mistakes, "#9c27b0"),
             ("Clear", self.clear_board, "#f44336"),
             ("Save", self.save_puzzle_to_file, "#2196f3")
         ]
@@ -334,92 +356,225 @@ class SudokuGUI:
             btn.bind("<Leave>", lambda e, b=btn, c=color: b.config(bg=c))
         self.root.update()
 
-    def select_cell(self, row, col):
+    def handle_click(self, event):
+        cell = self.view.cell_at(event.x, event.y)
+        if cell:
+            self.select_cell(*cell)
+
+    def move_selection(self, drow, dcol):
+        if not self.board:
+            return "break"
+        row, col = self.selected_cell or (0, 0)
         if self.selected_cell:
-            self.reset_cell_colors()
+            row = (row + drow) % self.board.size
+            col = (col + dcol) % self.board.size
+        self.select_cell(row, col)
+        return "break"
+
+    def cell_background(self, cell):
+        if cell == self.selected_cell:
+            return SELECTED_COLOR
+        if cell in self.conflicts:
+            return CONFLICT_COLOR
+        if cell in self.highlighted:
+            return HIGHLIGHT_COLOR
+        return "white"
+
+    def select_cell(self, row, col):
+        self.reset_cell_colors()
         self.selected_cell = (row, col)
-        self.cells[(row, col)].config(bg="#add8e6")
-        for i in range(self.board.size):
-            self.cells[(row, i)].config(bg="#add8e6")
-            self.cells[(i, col)].config(bg="#add8e6")
-        start_row = (row // self.board.subgrid_rows) * self.board.subgrid_rows
-        start_col = (col // self.board.subgrid_cols) * self.board.subgrid_cols
-        for i in range(start_row, start_row + self.board.subgrid_rows):
-            for j in range(start_col, start_col + self.board.subgrid_cols):
-                self.cells[(i, j)].config(bg="#add8e6")
-        self.cells[(row, col)].focus_set()
+        size = self.board.size
+        self.highlighted = {divmod(peer, size) for peer in self.board.geometry.peers[row * size + col]}
+        self.highlighted.add((row, col))
+        for i, j in self.highlighted:
+            self.view.update_cell(i, j, bg=self.cell_background((i, j)))
+        self.view.canvas.focus_set()
 
     def reset_cell_colors(self):
-        for i in range(self.board.size):
-            for j in range(self.board.size):
-                self.cells[(i, j)].config(bg="white", fg="black" if (i, j) not in self.original_cells else "black")
+        highlighted = self.highlighted
+        self.highlighted = set()
+        self.selected_cell = None
+        for cell in highlighted:
+            self.view.update_cell(*cell, bg=self.cell_background(cell))
+        for i, j in self.marked:
+            self.view.update_cell(i, j, fg="black")
+        self.marked.clear()
+
+    def refresh_conflicts(self, row, col):
+        # Only the changed cell and its peers can gain or lose a conflict;
+        # the board answers each of them from its unit counts.
+        size = self.board.size
+        for cell in ((row, col), *(divmod(peer, size) for peer in self.board.geometry.peers[row * size + col])):
+            if self.board.in_conflict(*cell):
+                if cell in self.conflicts:
+                    continue
+                self.conflicts.add(cell)
+            elif cell in self.conflicts:
+                self.conflicts.discard(cell)
+            else:
+                continue
+            self.view.update_cell(*cell, bg=self.cell_background(cell))
+
+    def mark_cell(self, row, col):
+        self.view.update_cell(row, col, fg="red")
+        self.marked.add((row, col))
 
     def handle_key(self, event):
-        if not self.selected_cell or self.selected_cell in self.original_cells:
+        if self.generating or not self.selected_cell or self.selected_cell in self.original_cells:
             return "break"
         row, col = self.selected_cell
         char = event.char
-        if char in [str(i) for i in range(1, self.board.size + 1)]:
-            value = int(char)
-            if self.board.is_valid_move(row, col, value):
-                self.board.set_cell(row, col, value)
-                self.cells[(row, col)].delete(0, tk.END)
-                self.cells[(row, col)].insert(0, str(value))
-                self.cells[(row, col)].config(fg="black")
+        value = parse_value(char, self.board.size) if len(char) == 1 else None
+        if value:
+            valid = self.board.is_valid_move(row, col, value)
+            # A clashing value is still placed, so the clash is shaded on
+            # the board until the player clears or replaces it, but it
+            # costs a wrong attempt.
+            self.board.set_cell(row, col, value)
+            self.marked.discard((row, col))
+            self.view.update_cell(row, col, text=format_value(value), fg="black")
+            self.refresh_conflicts(row, col)
+            if valid:
                 if self.is_board_complete():
                     if messagebox.askyesno("Congratulations", "Puzzle Solved! Start a new game?"):
                         self.generate_puzzle()
             else:
                 self.wrong_count -= 1
                 self.wrong_count_label.config(text=f"Wrong Attempts Left: {self.wrong_count}")
-                self.cells[(row, col)].config(fg="red")
+                self.mark_cell(row, col)
                 if self.wrong_count <= 0:
                     messagebox.showinfo("Game Over", "No wrong attempts left! Returning to main menu.")
                     self.show_welcome_screen()
-        elif char in ["\b", ""]:
+        elif char == "\b" or event.keysym in ("BackSpace", "Delete"):
             self.board.set_cell(row, col, 0)
-            self.cells[(row, col)].delete(0, tk.END)
-            self.cells[(row, col)].config(fg="black")
+            self.marked.discard((row, col))
+            self.view.update_cell(row, col, text="", fg="black")
+            self.refresh_conflicts(row, col)
         return "break"
 
     def update_grid(self):
-        if not self.cells or not self.board:
+        if not self.view or not self.board:
             return
+        selected = self.selected_cell
+        self.selected_cell = None
         self.original_cells.clear()
+        self.highlighted.clear()
+        self.marked.clear()
+        self.conflicts.clear()
         for i in range(self.board.size):
             for j in range(self.board.size):
                 value = self.board.get_cell(i, j)
-                self.cells[(i, j)].delete(0, tk.END)
                 if value != 0:
-                    self.cells[(i, j)].insert(0, str(value))
-                    self.cells[(i, j)].config(fg="black", font=("Arial", 16, "bold"))
                     self.original_cells.add((i, j))
-                else:
-                    self.cells[(i, j)].config(fg="black", font=("Arial", 16))
-                self.cells[(i, j)].config(bg="white", state="normal" if (i, j) not in self.original_cells else "readonly")
-        if self.selected_cell:
-            self.select_cell(*self.selected_cell)
+                if self.board.in_conflict(i, j):
+                    self.conflicts.add((i, j))
+                self.view.update_cell(i, j, text=format_value(value), fg="black",
+                                      bg=self.cell_background((i, j)), bold=value != 0)
+        if selected:
+            self.select_cell(*selected)
 
     def generate_puzzle(self):
-        if not self.board:
+        if self.generating:
             return
+        size = SIZE_OPTIONS[self.grid_size_var.get()]
         difficulty = self.difficulty_var.get()
-        clue_map = {
-            9: {"Easy": 36, "Medium": 30, "Hard": 25},
-            8: {"Easy": 30, "Medium": 25, "Hard": 20},
-            6: {"Easy": 20, "Medium": 16, "Hard": 12}
-        }
-        clues = clue_map[self.board.size][difficulty]
-        self.board.generate_full_board()
-        self.board.remove_numbers(clues)
+        board = self.library_puzzle(size, difficulty) or self.puzzle_pool.get(size, difficulty)
+        if board:
+            self.show_puzzle(board, difficulty)
+        else:
+            self.generate_puzzle_async(size, difficulty)
+
+    def library_puzzle(self, size, difficulty):
+        # A puzzle library next to the game is used first: a random record is
+        # a memory-mapped read and needs no generation or validation.
+        if self.library is None:
+            if not os.path.exists(LIBRARY_FILE):
+                return None
+            try:
+                from sudoku_library import PuzzleLibrary
+                self.library = PuzzleLibrary(LIBRARY_FILE)
+            except (OSError, ValueError, struct.error) as e:
+                # A damaged file is skipped for the rest of the session.
+                logger.warning("Ignoring puzzle library %s: %s", LIBRARY_FILE, e)
+                self.library = False
+                return None
+        if not self.library:
+            return None
+        return self.library.random_board(size, difficulty)
+
+    def generate_puzzle_async(self, size, difficulty):
+        # Nothing pooled yet: generate on a worker thread and poll for the
+        # result from the Tk event loop so the window stays responsive.
+        self.generating = True
+        self.show_progress(f"Generating {difficulty} {size}x{size} puzzle...")
+        result = queue.Queue(maxsize=1)
+
+        def work():
+            try:
+                result.put(generate_puzzle_board(size, difficulty, stats=DEBUG_STATS))
+            except Exception as e:
+                result.put(e)
+
+        threading.Thread(target=work, daemon=True).start()
+        self.root.after(50, self.poll_generation, result, difficulty)
+
+    def poll_generation(self, result, difficulty):
+        try:
+            board = result.get_nowait()
+        except queue.Empty:
+            self.root.after(50, self.poll_generation, result, difficulty)
+            return
+        self.generating = False
+        self.hide_progress()
+        if isinstance(board, Exception):
+            messagebox.showerror("Error", f"Failed to start game: {str(board)}")
+            self.show_welcome_screen()
+            return
+        self.show_puzzle(board, difficulty)
+
+    def show_progress(self, text):
+        self.progress_frame = tk.Frame(self.main_frame, bg="#f0f0f0", borderwidth=1, relief="solid")
+        self.progress_frame.place(relx=0.5, rely=0.5, anchor="center")
+        tk.Label(self.progress_frame, text=text, bg="#f0f0f0", font=("Arial", 12)).pack(padx=20, pady=(15, 5))
+        progress_bar = ttk.Progressbar(self.progress_frame, mode="indeterminate", length=200)
+        progress_bar.pack(padx=20, pady=(5, 15))
+        progress_bar.start(10)
+
+    def hide_progress(self):
+        if self.progress_frame:
+            self.progress_frame.destroy()
+        self.progress_frame = None
+
+    def show_puzzle(self, board, difficulty):
+        self.board = board
+        self.selected_cell = None
         self.wrong_count = 3
         self.hint_count = 0
+        if not self.view or self.view.size != board.size:
+            self.show_game_screen()
         self.update_grid()
         if self.wrong_count_label:
             self.wrong_count_label.config(text=f"Wrong Attempts Left: {self.wrong_count}")
         if self.hint_count_label:
             self.hint_count_label.config(text=f"Hints Used: {self.hint_count}/{self.max_hints}")
-        messagebox.showinfo("Success", f"{difficulty} {self.board.size}x{self.board.size} puzzle generated with {clues} clues.")
+        if self.debug_label:
+            # Pooled, transformed and library puzzles carry no search stats;
+            # never leave the previous puzzle's numbers on display.
+            if board.stats_recorder:
+                self.debug_label.config(text="\n".join(entry.summary() for entry in board.stats_recorder.history))
+            else:
+                self.debug_label.config(text="No search stats: pooled or library puzzle.")
+        clues = sum(1 for i in range(board.size) for j in range(board.size) if board.get_cell(i, j) != 0)
+        grade = board.grade()
+        technique = grade.hardest if grade.solved else "more than the technique ladder"
+        message = (f"{difficulty} {board.size}x{board.size} puzzle generated with {clues} clues.\n"
+                   f"Hardest technique needed: {technique} (score {grade.score}).")
+        if grade.solved and grade.level < GRADE_TARGETS[difficulty][0]:
+            # Digging gave up on the target grade (common on small grids);
+            # say so rather than pass the puzzle off as the difficulty asked.
+            message += (f"\nNo puzzle needing {difficulty} techniques turned up for this grid size, "
+                        f"so this one is easier than {difficulty}.")
+        messagebox.showinfo("Success", message)
 
     def get_hint(self):
         if not self.board:
@@ -438,9 +593,9 @@ class SudokuGUI:
         if hint:
             row, col, value = hint
             self.board.set_cell(row, col, value)
-            self.cells[(row, col)].delete(0, tk.END)
-            self.cells[(row, col)].insert(0, str(value))
-            self.cells[(row, col)].config(fg="black", font=("Arial", 16))
+            self.marked.discard((row, col))
+            self.view.update_cell(row, col, text=format_value(value), fg="black", bold=False)
+            self.refresh_conflicts(row, col)
             self.hint_count += 1
             self.hint_count_label.config(text=f"Hints Used: {self.hint_count}/{self.max_hints}")
             if self.is_board_complete():
@@ -449,6 +604,18 @@ class SudokuGUI:
         else:
             messagebox.showinfo("Hint", "No valid hint available for this cell.")
 
+    def check_mistakes(self):
+        if not self.board:
+            return
+        self.board.get_solution()
+        mistakes = self.board.find_mistakes()
+        if not mistakes:
+            messagebox.showinfo("Check", "No mistakes so far.")
+            return
+        for row, col in mistakes:
+            self.mark_cell(row, col)
+        messagebox.showinfo("Check", f"{len(mistakes)} entr{'y' if len(mistakes) == 1 else 'ies'} contradict the solution.")
+
     def clear_board(self):
         if not self.board:
             return
@@ -461,20 +628,17 @@ class SudokuGUI:
         self.update_grid()
         self.wrong_count_label.config(text=f"Wrong Attempts Left: {self.wrong_count}")
         self.hint_count_label.config(text=f"Hints Used: {self.hint_count}/{self.max_hints}")
-        self.selected_cell = None
+        self.reset_cell_colors()
 
     def is_board_complete(self):
         if not self.board:
             return False
-        for i in range(self.board.size):
-            for j in range(self.board.size):
-                if self.board.get_cell(i, j) == 0:
-                    return False
-                if not self.board.is_valid_move(i, j, self.board.get_cell(i, j)):
-                    return False
-        return True
+        return self.board.is_solved()
 
 if __name__ == "__main__":
+    if DEBUG_STATS:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    load_tk()
     root = tk.Tk()
     app = SudokuGUI(root)
     root.mainloop() 
\ No newline at end of file
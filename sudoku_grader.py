@@ -0,0 +1,250 @@
+import collections
+import functools
+
+# The ladder, easiest first: (name, points per use). The grader always
+# applies the easiest technique that makes progress, so the hardest one it
+# needed is a fair measure of how hard the puzzle is for a person.
+TECHNIQUES = (
+    ("naked single", 1),
+    ("hidden single", 2),
+    ("pointing", 5),
+    ("box-line reduction", 5),
+    ("naked pair", 8),
+    ("hidden pair", 10),
+    ("x-wing", 15),
+)
+TECHNIQUE_NAMES = tuple(name for name, _ in TECHNIQUES)
+
+Grade = collections.namedtuple("Grade", "score hardest level solved")
+
+
+def technique_level(name):
+    return TECHNIQUE_NAMES.index(name)
+
+
+class GradingTables:
+    # Unit intersections for one board shape, shared by every grader.
+    def __init__(self, geometry):
+        size = geometry.size
+        self.size = size
+        self.peers = geometry.peers
+        self.rows = geometry.rows
+        self.cols = geometry.cols
+        self.units = geometry.units
+        # (segment cells, rest of the line, rest of the box) for every
+        # intersection of a box with a row or a column.
+        self.intersections = []
+        for box in geometry.boxes:
+            box_cells = set(box)
+            lines = {geometry.rows[geometry.cell_row[cell]] for cell in box}
+            lines |= {geometry.cols[geometry.cell_col[cell]] for cell in box}
+            for line in sorted(lines):
+                segment = tuple(cell for cell in line if cell in box_cells)
+                self.intersections.append((segment,
+                                           tuple(cell for cell in line if cell not in box_cells),
+                                           tuple(cell for cell in box if cell not in segment)))
+
+
+@functools.lru_cache(maxsize=None)
+def get_grading_tables(geometry):
+    return GradingTables(geometry)
+
+
+class LogicalGrader:
+    def __init__(self, geometry):
+        self.tables = get_grading_tables(geometry)
+        self.full = (1 << geometry.size) - 1
+        self.candidates = None
+        self.values = None
+        self.empty = 0
+
+    def grade(self, cells):
+        # Solves with the ladder only. Returns Grade(score, hardest technique
+        # name, its level, solved); an unsolved grade means the puzzle needs
+        # guessing or something past the ladder.
+        tables = self.tables
+        self.candidates = candidates = [0] * len(cells)
+        self.values = list(cells)
+        self.empty = 0
+        for cell, value in enumerate(cells):
+            if value:
+                continue
+            used = 0
+            for peer in tables.peers[cell]:
+                if cells[peer]:
+                    used |= 1 << (cells[peer] - 1)
+            candidates[cell] = self.full & ~used
+            if not candidates[cell]:
+                return Grade(0, None, -1, False)
+            self.empty += 1
+        steps = (self.naked_single, self.hidden_single, self.pointing, self.box_line,
+                 self.naked_pair, self.hidden_pair, self.x_wing)
+        score = 0
+        level = -1
+        while self.empty:
+            for index, step in enumerate(steps):
+                progress = step()
+                if progress is None:
+                    return Grade(score, TECHNIQUE_NAMES[level] if level >= 0 else None, level, False)
+                if progress:
+                    score += TECHNIQUES[index][1] * progress
+                    level = max(level, index)
+                    break
+            else:
+                break
+        return Grade(score, TECHNIQUE_NAMES[level] if level >= 0 else None, level, self.empty == 0)
+
+    def place(self, cell, bit):
+        # Returns False when a peer is left without candidates.
+        candidates = self.candidates
+        candidates[cell] = 0
+        self.values[cell] = bit.bit_length()
+        self.empty -= 1
+        for peer in self.tables.peers[cell]:
+            if candidates[peer] & bit:
+                candidates[peer] &= ~bit
+                if not candidates[peer]:
+                    return False
+        return True
+
+    def eliminate(self, cells, bits):
+        # Removes bits from the empty cells given. True on progress, None on
+        # a contradiction.
+        candidates = self.candidates
+        progress = False
+        for cell in cells:
+            if candidates[cell] & bits:
+                candidates[cell] &= ~bits
+                if not candidates[cell]:
+                    return None
+                progress = True
+        return progress
+
+    # Each step returns True on progress, False when it does not apply and
+    # None when it runs into a contradiction. Naked singles are placed in one
+    # sweep and report how many were placed.
+    def naked_single(self):
+        candidates = self.candidates
+        placed = 0
+        for cell, bits in enumerate(candidates):
+            if bits and not bits & (bits - 1):
+                if not self.place(cell, bits):
+                    return None
+                placed += 1
+        return placed
+
+    def hidden_single(self):
+        candidates = self.candidates
+        for unit in self.tables.units:
+            once = twice = 0
+            for cell in unit:
+                bits = candidates[cell]
+                twice |= once & bits
+                once |= bits
+            hidden = once & ~twice
+            if hidden:
+                bit = hidden & -hidden
+                for cell in unit:
+                    if candidates[cell] & bit:
+                        return self.place(cell, bit) or None
+        return False
+
+    def pointing(self):
+        # A value confined to one line within a box leaves the rest of the line.
+        candidates = self.candidates
+        for segment, line_rest, box_rest in self.tables.intersections:
+            inside = 0
+            for cell in segment:
+                inside |= candidates[cell]
+            outside = 0
+            for cell in box_rest:
+                outside |= candidates[cell]
+            bits = inside & ~outside
+            if bits:
+                progress = self.eliminate(line_rest, bits)
+                if progress is not False:
+                    return progress
+        return False
+
+    def box_line(self):
+        # A value confined to one box within a line leaves the rest of the box.
+        candidates = self.candidates
+        for segment, line_rest, box_rest in self.tables.intersections:
+            inside = 0
+            for cell in segment:
+                inside |= candidates[cell]
+            outside = 0
+            for cell in line_rest:
+                outside |= candidates[cell]
+            bits = inside & ~outside
+            if bits:
+                progress = self.eliminate(box_rest, bits)
+                if progress is not False:
+                    return progress
+        return False
+
+    def naked_pair(self):
+        candidates = self.candidates
+        for unit in self.tables.units:
+            seen = {}
+            for cell in unit:
+                bits = candidates[cell]
+                if bits and bits.bit_count() == 2:
+                    if bits in seen:
+                        pair = (seen[bits], cell)
+                        progress = self.eliminate([other for other in unit if other not in pair], bits)
+                        if progress is not False:
+                            return progress
+                    else:
+                        seen[bits] = cell
+        return False
+
+    def hidden_pair(self):
+        candidates = self.candidates
+        for unit in self.tables.units:
+            places = collections.defaultdict(list)
+            for cell in unit:
+                bits = candidates[cell]
+                while bits:
+                    bit = bits & -bits
+                    places[bit].append(cell)
+                    bits ^= bit
+            pairs = {}
+            for bit, cells in places.items():
+                if len(cells) == 2:
+                    pairs.setdefault(tuple(cells), 0)
+                    pairs[tuple(cells)] |= bit
+            for cells, bits in pairs.items():
+                if bits.bit_count() == 2:
+                    progress = False
+                    for cell in cells:
+                        if candidates[cell] & ~bits:
+                            candidates[cell] &= bits
+                            progress = True
+                    if progress:
+                        return True
+        return False
+
+    def x_wing(self):
+        # A value with the same two places in two rows leaves those columns
+        # elsewhere (and the same with rows and columns swapped).
+        candidates = self.candidates
+        tables = self.tables
+        for lines, crossing in ((tables.rows, tables.cols), (tables.cols, tables.rows)):
+            bit = 1
+            while bit <= self.full:
+                seen = {}
+                for line in lines:
+                    positions = tuple(k for k, cell in enumerate(line) if candidates[cell] & bit)
+                    if len(positions) != 2:
+                        continue
+                    if positions in seen:
+                        skip = set(seen[positions]) | set(line)
+                        others = [cell for k in positions for cell in crossing[k] if cell not in skip]
+                        progress = self.eliminate(others, bit)
+                        if progress is not False:
+                            return progress
+                    else:
+                        seen[positions] = line
+                bit <<= 1
+        return False
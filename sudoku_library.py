@@ -0,0 +1,423 @@
+import array
+import collections
+import mmap
+import os
+import random
+import struct
+import sys
+from sudoku_engine import SudokuBoard, DIGITS
+
+# File layout: a fixed 64 byte header, then fixed-width records numbered
+# from 0, then the index (at the offset the header gives, possibly after a
+# gap). The index lists the live record numbers for every (size,
+# difficulty) pair, so fetching puzzle #k or a random puzzle of one kind is
+# a couple of reads from the memory map.
+MAGIC = b"SDKLIB\x00\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sHBBIIQ")
+HEADER_SIZE = 64
+RECORD_HEADER = struct.Struct("<BBBxHQ")
+INDEX_COUNT = struct.Struct("<H")
+INDEX_KEY = struct.Struct("<BBI")
+INDEX_ITEM = struct.Struct("<I")
+
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+NO_DIFFICULTY = 255
+FLAG_DELETED = 1
+FLAG_SEED = 2
+APPEND_BATCH = 4096
+
+LibraryEntry = collections.namedtuple("LibraryEntry", "number size difficulty seed deleted puzzle solution")
+
+
+def difficulty_code(difficulty):
+    if difficulty is None:
+        return NO_DIFFICULTY
+    if difficulty not in DIFFICULTIES:
+        raise ValueError(f"Unknown difficulty {difficulty!r}. Use one of: {', '.join(DIFFICULTIES)}.")
+    return DIFFICULTIES.index(difficulty)
+
+
+def difficulty_name(code):
+    return None if code == NO_DIFFICULTY else DIFFICULTIES[code]
+
+
+def pack_cells(cells, bits, width):
+    value = 0
+    for cell in reversed(cells):
+        value = (value << bits) | cell
+    return value.to_bytes(width, "little")
+
+
+def unpack_cells(data, bits, count):
+    value = int.from_bytes(data, "little")
+    mask = (1 << bits) - 1
+    cells = bytearray(count)
+    for i in range(count):
+        cells[i] = value & mask
+        value >>= bits
+    return bytes(cells)
+
+
+class PuzzleLibrary:
+    def __init__(self, path, writable=False):
+        self.path = path
+        self.writable = writable
+        self.file = open(path, "r+b" if writable else "rb")
+        self.data = None
+        try:
+            self.load()
+        except Exception:
+            self.file.close()
+            raise
+
+    @classmethod
+    def create(cls, path, max_size=25):
+        if not 1 <= max_size <= len(DIGITS):
+            raise ValueError(f"Library grid size must be between 1 and {len(DIGITS)}.")
+        bits = max_size.bit_length()
+        width = (max_size * max_size * bits + 7) // 8
+        record_size = RECORD_HEADER.size + 2 * width
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, max_size, bits, record_size, 0, HEADER_SIZE).ljust(HEADER_SIZE, b"\0"))
+            file.write(INDEX_COUNT.pack(0))
+        return cls(path, writable=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+    def load(self):
+        if self.data is not None:
+            self.data.close()
+        self.file.seek(0)
+        header = self.file.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a puzzle library.")
+        (_, version, self.max_size, self.bits, self.record_size,
+         self.count, self.index_offset) = HEADER.unpack_from(header)
+        if version != VERSION:
+            raise ValueError(f"Unsupported puzzle library version {version}.")
+        damaged = ValueError(f"{self.path} is damaged: its header or index does not fit the file.")
+        self.width = (self.max_size * self.max_size * self.bits + 7) // 8
+        if (not 1 <= self.max_size <= len(DIGITS) or self.bits != self.max_size.bit_length()
+                or self.record_size != RECORD_HEADER.size + 2 * self.width
+                or HEADER_SIZE + self.count * self.record_size > self.index_offset):
+            raise damaged
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        # key -> (offset of its record numbers, how many there are)
+        self.index = {}
+        offset = self.index_offset + INDEX_COUNT.size
+        if offset > len(self.data):
+            raise damaged
+        (keys,) = INDEX_COUNT.unpack_from(self.data, self.index_offset)
+        start = offset + keys * INDEX_KEY.size
+        if start > len(self.data):
+            raise damaged
+        for _ in range(keys):
+            size, difficulty, count = INDEX_KEY.unpack_from(self.data, offset)
+            self.index[(size, difficulty)] = (start, count)
+            offset += INDEX_KEY.size
+            start += count * INDEX_ITEM.size
+        if start > len(self.data):
+            raise damaged
+        self.index_end = start
+
+    def __len__(self):
+        return self.count
+
+    def counts(self):
+        return {(size, difficulty_name(difficulty)): count
+                for (size, difficulty), (_, count) in sorted(self.index.items())}
+
+    def entry(self, number):
+        if not 0 <= number < self.count:
+            raise IndexError(f"Puzzle #{number} is out of range (library holds {self.count}).")
+        offset = HEADER_SIZE + number * self.record_size
+        size, difficulty, flags, _, seed = RECORD_HEADER.unpack_from(self.data, offset)
+        start = offset + RECORD_HEADER.size
+        puzzle = unpack_cells(self.data[start:start + self.width], self.bits, size * size)
+        start += self.width
+        solution = unpack_cells(self.data[start:start + self.width], self.bits, size * size)
+        return LibraryEntry(number, size, difficulty_name(difficulty), seed if flags & FLAG_SEED else None,
+                            bool(flags & FLAG_DELETED), puzzle, solution)
+
+    def live_entry(self, number):
+        entry = self.entry(number)
+        if entry.deleted:
+            raise IndexError(f"Puzzle #{number} was removed.")
+        return entry
+
+    def board(self, number, engine="bitmask"):
+        # The stored solution was checked when the record was written, so the
+        # board is handed out without counting solutions again.
+        entry = self.live_entry(number)
+        board = SudokuBoard(entry.size, engine)
+        board.restore(entry.puzzle)
+        board.solution = entry.solution
+        return board
+
+    def random_number(self, size, difficulty=None, rng=None):
+        rng = rng or random
+        if difficulty is None:
+            keys = [key for key in self.index if key[0] == size]
+        else:
+            keys = [(size, difficulty_code(difficulty))]
+        total = sum(self.index[key][1] for key in keys if key in self.index)
+        if not total:
+            return None
+        pick = rng.randrange(total)
+        for key in keys:
+            start, count = self.index.get(key, (0, 0))
+            if pick < count:
+                return INDEX_ITEM.unpack_from(self.data, start + pick * INDEX_ITEM.size)[0]
+            pick -= count
+
+    def random_board(self, size, difficulty=None, rng=None, engine="bitmask"):
+        number = self.random_number(size, difficulty, rng)
+        if number is None:
+            return None
+        try:
+            return self.board(number, engine)
+        except IndexError:
+            # Only a library whose index still lists a removed record.
+            return None
+
+    def index_lists(self):
+        lists = {}
+        for key, (start, count) in self.index.items():
+            numbers = array.array("I")
+            numbers.frombytes(self.data[start:start + count * INDEX_ITEM.size])
+            if sys.byteorder != "little":
+                numbers.byteswap()
+            lists[key] = numbers
+        return lists
+
+    def write_at(self, offset, data):
+        self.file.seek(offset)
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def write_header(self, count, index_offset):
+        self.write_at(0, HEADER.pack(MAGIC, VERSION, self.max_size, self.bits, self.record_size, count, index_offset))
+        self.count = count
+        self.index_offset = index_offset
+
+    def write_index(self, lists, count, records=b""):
+        # Writes the new records (numbered from self.count up to count) and
+        # the index. The header is the commit point: nothing the current
+        # header refers to is overwritten before the header itself, so an
+        # interrupted append or remove leaves the previous library intact.
+        keys = sorted(key for key in lists if lists[key])
+        parts = [INDEX_COUNT.pack(len(keys))]
+        parts.extend(INDEX_KEY.pack(size, difficulty, len(lists[(size, difficulty)])) for size, difficulty in keys)
+        for key in keys:
+            numbers = array.array("I", lists[key])
+            if sys.byteorder != "little":
+                numbers.byteswap()
+            parts.append(numbers.tobytes())
+        index = b"".join(parts)
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        records_end = HEADER_SIZE + count * self.record_size
+        live_start, live_end = self.index_offset, self.index_end
+        if records and live_start < records_end:
+            # The new records would overwrite the live index: move a copy of
+            # it past both, and point the header there first.
+            self.file.seek(live_start)
+            live = self.file.read(live_end - live_start)
+            moved = max(os.fstat(self.file.fileno()).st_size, records_end)
+            self.write_at(moved, live)
+            self.write_header(self.count, moved)
+            live_start, live_end = moved, moved + len(live)
+        if records:
+            self.write_at(HEADER_SIZE + self.count * self.record_size, records)
+        if records_end + len(index) <= live_start:
+            offset = records_end
+        else:
+            offset = max(live_end, records_end)
+        self.write_at(offset, index)
+        self.write_header(count, offset)
+        if offset != records_end and records_end + len(index) <= offset:
+            # The old index is dead now; move the new one down next to the
+            # records so the file does not keep the gap.
+            self.write_at(records_end, index)
+            self.write_header(count, records_end)
+            offset = records_end
+        self.file.truncate(offset + len(index))
+        self.file.flush()
+        self.load()
+
+    def append(self, entries):
+        # entries: (size, difficulty, seed, puzzle cells, solution cells).
+        # Every call rewrites the index; call with batches rather than one
+        # puzzle at a time.
+        if not self.writable:
+            raise ValueError("Library was opened read-only.")
+        lists = self.index_lists()
+        records = []
+        number = self.count
+        for size, difficulty, seed, puzzle, solution in entries:
+            if not 1 <= size <= self.max_size:
+                raise ValueError(f"{size}x{size} puzzles do not fit a library built for up to {self.max_size}x{self.max_size}.")
+            if len(puzzle) != size * size or len(solution) != size * size:
+                raise ValueError(f"Expected {size * size} cells for a {size}x{size} puzzle.")
+            flags = 0
+            if seed is not None:
+                if not 0 <= seed < 1 << 64:
+                    raise ValueError(f"Seed {seed} does not fit in 64 bits.")
+                flags |= FLAG_SEED
+            code = difficulty_code(difficulty)
+            records.append(RECORD_HEADER.pack(size, code, flags, sum(1 for value in puzzle if value), seed or 0))
+            records.append(pack_cells(puzzle, self.bits, self.width))
+            records.append(pack_cells(solution, self.bits, self.width))
+            lists.setdefault((size, code), array.array("I")).append(number)
+            number += 1
+        if number == self.count:
+            return range(number, number)
+        first = self.count
+        self.write_index(lists, number, b"".join(records))
+        return range(first, number)
+
+    def add_board(self, board, difficulty=None, seed=None):
+        if board.solution is None and board.count_solutions() != 1:
+            raise ValueError("Puzzle does not have exactly one solution.")
+        return self.append([(board.size, difficulty, seed, board.snapshot(), board.solution)])[0]
+
+    def remove(self, numbers):
+        if not self.writable:
+            raise ValueError("Library was opened read-only.")
+        numbers = set(numbers)
+        # Every number is checked before anything is written, so a bad one
+        # leaves no flagged record behind that the index still lists.
+        for number in numbers:
+            if not 0 <= number < self.count:
+                raise IndexError(f"Puzzle #{number} is out of range (library holds {self.count}).")
+        for number in numbers:
+            offset = HEADER_SIZE + number * self.record_size
+            flags = self.data[offset + 2] | FLAG_DELETED
+            self.file.seek(offset + 2)
+            self.file.write(bytes([flags]))
+        lists = self.index_lists()
+        for key, items in lists.items():
+            lists[key] = array.array("I", (number for number in items if number not in numbers))
+        self.write_index(lists, self.count)
+
+    def compact(self, dedupe=True):
+        # Rewrites the library without removed records (and, with dedupe,
+        # without repeated puzzles), then swaps it in. Numbers change.
+        if not self.writable:
+            raise ValueError("Library was opened read-only.")
+        temp = self.path + ".tmp"
+        seen = set()
+        kept = 0
+        with PuzzleLibrary.create(temp, self.max_size) as target:
+            batch = []
+            for number in range(self.count):
+                entry = self.entry(number)
+                if entry.deleted or (dedupe and entry.puzzle in seen):
+                    continue
+                if dedupe:
+                    seen.add(entry.puzzle)
+                batch.append((entry.size, entry.difficulty, entry.seed, entry.puzzle, entry.solution))
+                if len(batch) >= APPEND_BATCH:
+                    kept += len(target.append(batch))
+                    batch = []
+            kept += len(target.append(batch))
+        dropped = self.count - kept
+        self.data.close()
+        self.data = None
+        self.file.close()
+        os.replace(temp, self.path)
+        self.file = open(self.path, "r+b")
+        self.load()
+        return kept, dropped
+
+
+def checked_entry(puzzle, solution=None, difficulty=None, seed=None):
+    # Validates a text puzzle once, on the way into the library; boards are
+    # served later without checking again. The puzzle must have exactly one
+    # solution, and a supplied solution must be that one.
+    board = SudokuBoard.from_string(puzzle)
+    if solution:
+        solved = SudokuBoard.from_string(solution, board.size)
+        if not solved.is_solved() or any(value and value != solved.cells[cell] for cell, value in enumerate(board.cells)):
+            raise ValueError("Solution does not solve the puzzle.")
+    if board.count_solutions() != 1:
+        raise ValueError("Puzzle does not have exactly one solution.")
+    if solution and board.solution != solved.snapshot():
+        raise ValueError("Solution does not solve the puzzle.")
+    solution = board.solution
+    return board.size, difficulty, seed, board.snapshot(), solution
+
+
+def read_text(lines):
+    # Yields (puzzle, solution, seed) from the one-line format written by
+    # `python -m sudoku generate`, or a single puzzle from a legacy grid
+    # file like sudoku.txt (one row per line, space-separated values).
+    rows = [line.split() for line in lines if line.strip() and not line.lstrip().startswith("#")]
+    if rows and len(rows[0]) > 1 and all(len(field) <= 2 for field in rows[0]):
+        size = len(rows)
+        if any(len(row) != size for row in rows):
+            raise ValueError("Grid rows must all have as many values as there are rows.")
+        yield "".join(grid_symbol(value, size) for row in rows for value in row), None, None
+        return
+    for fields in rows:
+        solution = fields[1] if len(fields) > 1 else None
+        seed = int(fields[3]) if len(fields) > 3 and fields[3].isdigit() else None
+        yield fields[0], solution, seed
+
+
+def grid_symbol(text, size):
+    if text in "0.":
+        return "."
+    if text.isdigit() and 1 <= int(text) <= size:
+        return DIGITS[int(text) - 1]
+    if len(text) == 1 and 0 < DIGITS.find(text.upper()) + 1 <= size:
+        return text.upper()
+    raise ValueError(f"Invalid value {text!r}. Use 0 or . for empty cells and numbers 1 to grid size.")
+
+
+def import_text(library, lines, difficulty=None):
+    added = rejected = 0
+    batch = []
+    for puzzle, solution, seed in read_text(lines):
+        try:
+            batch.append(checked_entry(puzzle, solution, difficulty, seed))
+        except ValueError:
+            rejected += 1
+            continue
+        if len(batch) >= APPEND_BATCH:
+            added += len(library.append(batch))
+            batch = []
+    added += len(library.append(batch))
+    return added, rejected
+
+
+def export_text(library, output, numbers=None):
+    written = 0
+    for number in range(len(library)) if numbers is None else numbers:
+        entry = library.entry(number)
+        if entry.deleted:
+            continue
+        puzzle = "".join(DIGITS[value - 1] if value else "." for value in entry.puzzle)
+        solution = "".join(DIGITS[value - 1] for value in entry.solution)
+        output.write(f"{puzzle} {solution} {number} {'-' if entry.seed is None else entry.seed}\n")
+        written += 1
+    return written
+
+
+def export_grid(library, number, output):
+    entry = library.live_entry(number)
+    for i in range(entry.size):
+        output.write(" ".join(str(value) for value in entry.puzzle[i * entry.size:(i + 1) * entry.size]) + "\n")
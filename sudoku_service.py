@@ -0,0 +1,380 @@
+import asyncio
+import collections
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import time
+from sudoku_engine import SudokuBoard, CLUE_MAP, DIGITS, generate_puzzle_board
+from sudoku_cache import SolutionCache
+
+# Line-delimited JSON over a Unix socket or localhost TCP. A request is
+# {"id": ..., "op": ..., "deadline": seconds, ...params}; every request gets
+# exactly one response {"id": ..., "ok": true, ...} or {"id": ..., "ok":
+# false, "error": ...}, in completion order.
+OPS = ("solve", "count", "validate", "hint", "generate")
+DEFAULT_DEADLINE = 30.0
+MAX_IN_FLIGHT = 256
+# Jobs cannot be stopped once a worker runs them, so requests are limited
+# to the game's grid sizes and to modest solution counts.
+MAX_COUNT = 1000
+LATENCY_SAMPLES = 1024
+
+Job = collections.namedtuple("Job", "op params expires future")
+
+worker_cache = None
+
+
+def init_worker(cache_path):
+    # Runs once per worker process: build the solution cache and warm the
+    # common 9x9 geometry and solver paths before the first request.
+    global worker_cache
+    worker_cache = SolutionCache(path=cache_path)
+    board = SudokuBoard(9)
+    board.generate_full_board(random.Random(0))
+    board.remove_numbers(CLUE_MAP[9]["Easy"], rng=random.Random(0))
+    board.count_solutions()
+
+
+def run_batch(jobs):
+    # Worker side: jobs are (op, params, expires). Jobs whose deadline has
+    # passed by the time they are reached are skipped.
+    hits, misses = worker_cache.hits, worker_cache.misses
+    results = []
+    for op, params, expires in jobs:
+        if time.time() > expires:
+            results.append((False, "deadline exceeded"))
+            continue
+        # Anything one request raises (bad input, a locked cache file) fails
+        # that request only, never the rest of the batch.
+        try:
+            results.append((True, run_request(op, params)))
+        except Exception as e:
+            results.append((False, str(e) or type(e).__name__))
+    return results, worker_cache.hits - hits, worker_cache.misses - misses
+
+
+def run_request(op, params):
+    if op == "generate":
+        size = int(params.get("size", 9))
+        difficulty = params.get("difficulty", "Medium")
+        if size not in CLUE_MAP or difficulty not in CLUE_MAP[size]:
+            raise ValueError(f"Unsupported size or difficulty: {size}, {difficulty!r}.")
+        seed = params.get("seed")
+        board = generate_puzzle_board(size, difficulty, random.Random(seed) if seed is not None else None)
+        grade = board.grade()
+        return {"puzzle": board.to_string(), "solution": "".join(DIGITS[value - 1] for value in board.solution),
+                "hardest": grade.hardest, "score": grade.score}
+    if "puzzle" not in params:
+        raise ValueError("Missing 'puzzle'.")
+    text = str(params["puzzle"]).strip()
+    if len(text) not in {size * size for size in CLUE_MAP}:
+        sizes = ", ".join(f"{n}x{n}" for n in sorted(CLUE_MAP))
+        raise ValueError(f"Unsupported puzzle of {len(text)} cells; use one of {sizes}.")
+    board = SudokuBoard.from_string(text)
+    if op == "solve":
+        if not board.solve():
+            raise ValueError("Puzzle has no solution.")
+        return {"solution": board.to_string()}
+    if op == "count":
+        limit = params.get("max", 2)
+        if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= MAX_COUNT:
+            raise ValueError(f"'max' must be an integer from 1 to {MAX_COUNT}.")
+        return {"count": worker_cache.count_solutions(board, limit)}
+    if op == "validate":
+        count = worker_cache.count_solutions(board)
+        return {"valid": count == 1, "count": count, "conflicts": board.conflict_count}
+    if op == "hint":
+        worker_cache.count_solutions(board)
+        hint = board.get_hint(params.get("row"), params.get("col"))
+        if hint is None:
+            raise ValueError("No hint available.")
+        row, col, value = hint
+        return {"row": row, "col": col, "value": value}
+    raise ValueError(f"Unknown op {op!r}.")
+
+
+def request_id(line):
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return None
+    return message.get("id") if isinstance(message, dict) else None
+
+
+class SudokuService:
+    # Requests from all connections go through one bounded queue. A batcher
+    # task groups up to batch_size of them (waiting at most batch_window for
+    # a batch to fill) and hands each batch to a warm process pool, with at
+    # most two batches per worker outstanding. A full queue stops reading
+    # from clients, and a per-connection in-flight limit does the same.
+    def __init__(self, workers=None, batch_size=32, batch_window=0.002, queue_size=1024, cache_path=None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.queue_size = queue_size
+        self.cache_path = cache_path
+        self.executor = None
+        self.queue = None
+        self.slots = None
+        self.batcher_task = None
+        self.started = time.time()
+        self.requests = collections.Counter()
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.batches = 0
+        self.batched = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.connections = 0
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+
+    async def start(self):
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            self.workers, initializer=init_worker, initargs=(self.cache_path,))
+        self.queue = asyncio.Queue(self.queue_size)
+        self.slots = asyncio.Semaphore(self.workers * 2)
+        self.batcher_task = asyncio.create_task(self.batcher())
+
+    async def close(self):
+        if self.batcher_task:
+            self.batcher_task.cancel()
+        if self.executor:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def serve(self, path=None, host="127.0.0.1", port=0, ready=None):
+        await self.start()
+        if path:
+            if os.path.exists(path):
+                os.remove(path)
+            server = await asyncio.start_unix_server(self.handle_connection, path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        address = path or "%s:%d" % server.sockets[0].getsockname()[:2]
+        print(f"Serving on {address} with {self.workers} workers.", file=sys.stderr)
+        if ready:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.close()
+
+    async def handle_connection(self, reader, writer):
+        self.connections += 1
+        in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(line):
+            try:
+                try:
+                    response = await self.handle_line(line)
+                except Exception as e:
+                    # Every request gets its one response, even when handling
+                    # it fails in a way nobody anticipated.
+                    self.failed += 1
+                    response = {"id": request_id(line), "ok": False, "error": f"internal error: {e!r}"}
+                async with write_lock:
+                    writer.write(json.dumps(response).encode() + b"\n")
+                    await writer.drain()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+            finally:
+                in_flight.release()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await in_flight.acquire()
+                task = asyncio.create_task(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def handle_line(self, line):
+        try:
+            message = json.loads(line)
+            if not isinstance(message, dict):
+                raise ValueError("Request must be a JSON object.")
+        except ValueError as e:
+            self.failed += 1
+            return {"id": None, "ok": False, "error": f"bad request: {e}"}
+        request_id = message.get("id")
+        op = message.get("op")
+        if op == "stats":
+            return {"id": request_id, "ok": True, **self.stats()}
+        # Only known ops are counted, so a client cannot grow the counter
+        # with arbitrary (or unhashable) values.
+        if op not in OPS:
+            self.failed += 1
+            return {"id": request_id, "ok": False, "error": f"unknown op {op!r}; use one of {', '.join(OPS + ('stats',))}"}
+        self.requests[op] += 1
+        try:
+            deadline = float(message.get("deadline", DEFAULT_DEADLINE))
+        except (TypeError, ValueError):
+            deadline = DEFAULT_DEADLINE
+        ok, value = await self.submit(op, message, deadline)
+        if ok:
+            return {"id": request_id, "ok": True, **value}
+        return {"id": request_id, "ok": False, "error": value}
+
+    async def submit(self, op, params, deadline):
+        start = time.perf_counter()
+        job = Job(op, params, time.time() + deadline, asyncio.get_running_loop().create_future())
+        try:
+            # Both waiting for queue space and waiting for the result count
+            # against the deadline; on timeout the job's future is cancelled,
+            # so a batch that has not gone out yet leaves it behind.
+            await asyncio.wait_for(self.queue.put(job), deadline)
+            ok, value = await asyncio.wait_for(job.future, max(0.0, job.expires - time.time()))
+        except asyncio.TimeoutError:
+            job.future.cancel()
+            self.timeouts += 1
+            return False, "deadline exceeded"
+        self.latencies.append(time.perf_counter() - start)
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+        return ok, value
+
+    async def batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            closes = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = closes - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            batch = [job for job in batch if not job.future.done()]
+            if not batch:
+                continue
+            await self.slots.acquire()
+            asyncio.create_task(self.dispatch(batch))
+
+    async def dispatch(self, batch):
+        loop = asyncio.get_running_loop()
+        self.batches += 1
+        self.batched += len(batch)
+        try:
+            results, hits, misses = await loop.run_in_executor(
+                self.executor, run_batch, [(job.op, job.params, job.expires) for job in batch])
+            self.cache_hits += hits
+            self.cache_misses += misses
+        except Exception as e:
+            results = [(False, f"worker failed: {e}")] * len(batch)
+        finally:
+            self.slots.release()
+        for job, result in zip(batch, results):
+            if not job.future.done():
+                job.future.set_result(result)
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(pct):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))]
+
+        return {
+            "uptime": time.time() - self.started,
+            "workers": self.workers,
+            "connections": self.connections,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "requests": dict(self.requests),
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "batches": self.batches,
+            "mean_batch": self.batched / self.batches if self.batches else 0,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "latency_p50": percentile(50),
+            "latency_p99": percentile(99),
+        }
+
+
+class ServiceError(RuntimeError):
+    pass
+
+
+class ServiceClient:
+    # Blocking client for tools that just want answers:
+    #     with ServiceClient(port=8765) as client:
+    #         client.call("solve", puzzle="53..7....")["solution"]
+    def __init__(self, path=None, host="127.0.0.1", port=None, timeout=None):
+        if path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection((host, port), timeout)
+        self.file = self.sock.makefile("rwb")
+        self.next_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def send(self, op, **params):
+        self.next_id += 1
+        self.file.write(json.dumps({"id": self.next_id, "op": op, **params}).encode() + b"\n")
+        self.file.flush()
+        return self.next_id
+
+    def receive(self):
+        line = self.file.readline()
+        if not line:
+            raise ServiceError("Connection closed by the service.")
+        return json.loads(line)
+
+    def call(self, op, **params):
+        request_id = self.send(op, **params)
+        response = self.receive()
+        if response.get("id") != request_id:
+            raise ServiceError("Out-of-order response; use send/receive when pipelining.")
+        if not response.get("ok"):
+            raise ServiceError(response.get("error"))
+        return response
+
+
+def serve(path=None, host="127.0.0.1", port=0, **options):
+    service = SudokuService(**options)
+    try:
+        asyncio.run(service.serve(path, host, port))
+    except KeyboardInterrupt:
+        pass
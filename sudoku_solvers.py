@@ -0,0 +1,509 @@
+import collections
+import functools
+import math
+import sys
+import time
+
+CONTRADICTION = -2
+SOLVED = -1
+
+
+class BoardGeometry:
+    # Index math for one board shape, computed once and shared by every
+    # board and solver of that shape. Cells are numbered row-major.
+    __slots__ = ("size", "subgrid_rows", "subgrid_cols", "cell_row", "cell_col", "cell_box",
+                 "rows", "cols", "boxes", "units", "peers")
+
+    def __init__(self, size, subgrid_rows, subgrid_cols):
+        self.size = size
+        self.subgrid_rows = subgrid_rows
+        self.subgrid_cols = subgrid_cols
+        boxes_per_row = size // subgrid_cols
+        cells = range(size * size)
+        self.cell_row = tuple(c // size for c in cells)
+        self.cell_col = tuple(c % size for c in cells)
+        self.cell_box = tuple((c // size // subgrid_rows) * boxes_per_row + c % size // subgrid_cols for c in cells)
+        self.rows = tuple(tuple(c for c in cells if self.cell_row[c] == i) for i in range(size))
+        self.cols = tuple(tuple(c for c in cells if self.cell_col[c] == i) for i in range(size))
+        self.boxes = tuple(tuple(c for c in cells if self.cell_box[c] == i) for i in range(size))
+        self.units = self.rows + self.cols + self.boxes
+        self.peers = tuple(
+            tuple(sorted((set(self.rows[self.cell_row[c]]) | set(self.cols[self.cell_col[c]])
+                          | set(self.boxes[self.cell_box[c]])) - {c}))
+            for c in cells
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def get_geometry(size, subgrid_rows, subgrid_cols):
+    return BoardGeometry(size, subgrid_rows, subgrid_cols)
+
+
+def ensure_recursion_limit(cells):
+    # Both solvers recurse once per branching cell (twice when instrumented),
+    # which can pass Python's default limit on 25x25 boards.
+    needed = 2 * cells + 200
+    if sys.getrecursionlimit() < needed:
+        sys.setrecursionlimit(needed)
+
+
+class SearchStats:
+    __slots__ = ("operation", "nodes", "backtracks", "valid_move_checks", "propagations",
+                 "depth", "max_depth", "start", "wall_time", "recorder")
+
+    def __init__(self, operation, recorder):
+        self.operation = operation
+        self.nodes = 0
+        self.backtracks = 0
+        self.valid_move_checks = 0
+        self.propagations = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.recorder = recorder
+        self.wall_time = 0.0
+        self.start = time.perf_counter()
+
+    def enter(self):
+        self.nodes += 1
+        self.depth += 1
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+        recorder = self.recorder
+        if recorder.callback and self.nodes % recorder.interval == 0:
+            self.wall_time = time.perf_counter() - self.start
+            recorder.callback(self)
+
+    def leave(self, success):
+        self.depth -= 1
+        if not success:
+            self.backtracks += 1
+
+    def finish(self):
+        self.wall_time = time.perf_counter() - self.start
+        self.recorder.history.append(self)
+        if self.recorder.callback:
+            self.recorder.callback(self)
+
+    def as_dict(self):
+        return {
+            "operation": self.operation,
+            "nodes": self.nodes,
+            "backtracks": self.backtracks,
+            "valid_move_checks": self.valid_move_checks,
+            "propagations": self.propagations,
+            "max_depth": self.max_depth,
+            "wall_time": self.wall_time,
+        }
+
+    def summary(self):
+        return (f"{self.operation}: {self.nodes} nodes, {self.backtracks} backtracks, "
+                f"{self.valid_move_checks} move checks, {self.propagations} propagations, "
+                f"depth {self.max_depth}, {self.wall_time * 1000:.1f} ms")
+
+
+class StatsRecorder:
+    # Collects one SearchStats per top-level board operation. The callback,
+    # if any, sees the live stats every `interval` search nodes and once more
+    # when the operation finishes.
+    def __init__(self, callback=None, interval=1000, keep=16):
+        self.callback = callback
+        self.interval = interval
+        self.history = collections.deque(maxlen=keep)
+
+
+class BitmaskSolver:
+    def __init__(self, geometry):
+        size = geometry.size
+        ensure_recursion_limit(size * size)
+        self.size = size
+        self.full = (1 << size) - 1
+        self.cell_row = geometry.cell_row
+        self.cell_col = geometry.cell_col
+        self.cell_box = geometry.cell_box
+        self.units = geometry.units
+        self.values = [0] * (size * size)
+        self.row_used = [0] * size
+        self.col_used = [0] * size
+        self.box_used = [0] * size
+        self.limit = 0
+        self.found = 0
+        self.solution = None
+        self.rng = None
+        self.nodes = 0
+        self.node_budget = math.inf
+        self.exhausted = False
+
+    def load(self, cells):
+        size = self.size
+        self.values = [0] * (size * size)
+        self.row_used = [0] * size
+        self.col_used = [0] * size
+        self.box_used = [0] * size
+        for cell, value in enumerate(cells):
+            if value == 0:
+                continue
+            bit = 1 << (value - 1)
+            if not self.candidates(cell) & bit:
+                return False
+            self.place(cell, bit)
+        return True
+
+    def candidates(self, cell):
+        return self.full & ~(self.row_used[self.cell_row[cell]]
+                             | self.col_used[self.cell_col[cell]]
+                             | self.box_used[self.cell_box[cell]])
+
+    def place(self, cell, bit):
+        self.values[cell] = bit.bit_length()
+        self.row_used[self.cell_row[cell]] |= bit
+        self.col_used[self.cell_col[cell]] |= bit
+        self.box_used[self.cell_box[cell]] |= bit
+
+    def clear(self, cell):
+        bit = 1 << (self.values[cell] - 1)
+        self.values[cell] = 0
+        self.row_used[self.cell_row[cell]] ^= bit
+        self.col_used[self.cell_col[cell]] ^= bit
+        self.box_used[self.cell_box[cell]] ^= bit
+
+    def undo(self, trail):
+        for cell in reversed(trail):
+            self.clear(cell)
+
+    def propagate(self, trail):
+        # Fill naked and hidden singles until nothing changes. Returns the
+        # most constrained empty cell, SOLVED or CONTRADICTION.
+        values = self.values
+        cell_row, cell_col, cell_box = self.cell_row, self.cell_col, self.cell_box
+        row_used, col_used, box_used = self.row_used, self.col_used, self.box_used
+        full = self.full
+        while True:
+            progress = False
+            best = SOLVED
+            best_count = self.size + 1
+            for cell in range(len(values)):
+                if values[cell]:
+                    continue
+                cands = full & ~(row_used[cell_row[cell]] | col_used[cell_col[cell]] | box_used[cell_box[cell]])
+                if not cands:
+                    return CONTRADICTION
+                if not cands & (cands - 1):
+                    self.place(cell, cands)
+                    trail.append(cell)
+                    progress = True
+                    continue
+                count = cands.bit_count()
+                if count < best_count:
+                    best = cell
+                    best_count = count
+            if progress:
+                continue
+            if best == SOLVED:
+                return SOLVED
+            for unit in self.units:
+                once = twice = used = 0
+                for cell in unit:
+                    if values[cell]:
+                        used |= 1 << (values[cell] - 1)
+                        continue
+                    cands = full & ~(row_used[cell_row[cell]] | col_used[cell_col[cell]] | box_used[cell_box[cell]])
+                    twice |= once & cands
+                    once |= cands
+                if (once | used) != full:
+                    return CONTRADICTION
+                hidden = once & ~twice
+                while hidden:
+                    bit = hidden & -hidden
+                    hidden ^= bit
+                    for cell in unit:
+                        if not values[cell] and self.candidates(cell) & bit:
+                            self.place(cell, bit)
+                            trail.append(cell)
+                            progress = True
+                            break
+                    else:
+                        return CONTRADICTION
+            if not progress:
+                return best
+
+    def search(self):
+        self.nodes += 1
+        if self.nodes > self.node_budget:
+            self.exhausted = True
+            return
+        trail = []
+        cell = self.propagate(trail)
+        if cell == CONTRADICTION:
+            self.undo(trail)
+            return
+        if cell == SOLVED:
+            self.found += 1
+            if self.solution is None:
+                self.solution = list(self.values)
+            self.undo(trail)
+            return
+        cands = self.candidates(cell)
+        bits = []
+        while cands:
+            bit = cands & -cands
+            cands ^= bit
+            bits.append(bit)
+        if self.rng is not None:
+            self.rng.shuffle(bits)
+        for bit in bits:
+            self.place(cell, bit)
+            self.search()
+            self.clear(cell)
+            if self.found >= self.limit or self.exhausted:
+                break
+        self.undo(trail)
+
+    def count(self, limit=2, node_budget=None):
+        # With a node budget the search may stop early; `exhausted` then
+        # tells the caller the count is only a lower bound.
+        self.limit = limit
+        self.found = 0
+        self.solution = None
+        self.nodes = 0
+        self.node_budget = math.inf if node_budget is None else node_budget
+        self.exhausted = False
+        if limit > 0:
+            self.search()
+        return self.found
+
+    def fill(self, rng, node_budget=None):
+        # Completes the loaded givens with a random solution, trying
+        # candidate values in shuffled order.
+        self.rng = rng
+        try:
+            found = self.count(1, node_budget)
+        finally:
+            self.rng = None
+        return self.solution if found else None
+
+    def solve(self):
+        if not self.count(1):
+            return None
+        return self.solution
+
+    def has_other_solution(self, cell, value, node_budget=None):
+        # With the current puzzle known to be unique before `cell` was
+        # cleared, it stays unique exactly when no other value fits there.
+        # A search that runs out of budget counts as "maybe", which keeps
+        # the clue and so never loses uniqueness.
+        cands = self.candidates(cell) & ~(1 << (value - 1))
+        while cands:
+            bit = cands & -cands
+            cands ^= bit
+            self.place(cell, bit)
+            found = self.count(1, node_budget)
+            self.clear(cell)
+            if found or self.exhausted:
+                return True
+        return False
+
+
+class InstrumentedBitmaskSolver(BitmaskSolver):
+    # Only built while a board records stats, so the plain solver pays
+    # nothing for instrumentation.
+    def __init__(self, geometry, stats):
+        super().__init__(geometry)
+        self.stats = stats
+
+    def propagate(self, trail):
+        self.stats.propagations += 1
+        return super().propagate(trail)
+
+    def search(self):
+        found = self.found
+        self.stats.enter()
+        super().search()
+        self.stats.leave(self.found > found)
+
+
+class DLXSolver:
+    # Exact cover over N^3 candidate rows and 4 N^2 constraint columns:
+    # cell filled, digit in row, digit in column and digit in box. The
+    # links are built once and every query covers its givens, searches and
+    # uncovers them again, so one instance serves any number of puzzles of
+    # the same shape.
+    def __init__(self, geometry):
+        size = geometry.size
+        ensure_recursion_limit(size * size)
+        self.size = size
+        n = size
+        n2 = n * n
+        ncols = 4 * n2
+        self.L = L = [ncols] + list(range(ncols))
+        self.R = R = list(range(1, ncols + 1)) + [0]
+        self.U = U = list(range(ncols + 1))
+        self.D = D = list(range(ncols + 1))
+        self.C = C = list(range(ncols + 1))
+        self.S = S = [0] * (ncols + 1)
+        self.node_row = node_row = [-1] * (ncols + 1)
+        self.row_node = []
+        for cell in range(n2):
+            i, j = divmod(cell, n)
+            box = geometry.cell_box[cell]
+            for d in range(n):
+                columns = (1 + cell, 1 + n2 + i * n + d, 1 + 2 * n2 + j * n + d, 1 + 3 * n2 + box * n + d)
+                first = len(C)
+                for k, col in enumerate(columns):
+                    node = first + k
+                    C.append(col)
+                    node_row.append(cell * n + d)
+                    U.append(U[col])
+                    D.append(col)
+                    D[U[col]] = node
+                    U[col] = node
+                    L.append(first + (k - 1) % 4)
+                    R.append(first + (k + 1) % 4)
+                    S[col] += 1
+                self.row_node.append(first)
+        self.covered = [False] * (ncols + 1)
+        self.limit = 0
+        self.found = 0
+        self.solution = None
+
+    def cover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        self.covered[c] = True
+        L[R[c]] = L[c]
+        R[L[c]] = R[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        L[R[c]] = c
+        R[L[c]] = c
+        self.covered[c] = False
+
+    def search(self, chosen):
+        R, D, C, S = self.R, self.D, self.C, self.S
+        c = R[0]
+        if c == 0:
+            self.found += 1
+            if self.solution is None:
+                self.solution = list(chosen)
+            return
+        best = c
+        best_size = S[c]
+        c = R[c]
+        while c != 0 and best_size > 1:
+            if S[c] < best_size:
+                best = c
+                best_size = S[c]
+            c = R[c]
+        if best_size == 0:
+            return
+        self.cover(best)
+        r = D[best]
+        while r != best:
+            chosen.append(r)
+            j = R[r]
+            while j != r:
+                self.cover(C[j])
+                j = R[j]
+            self.search(chosen)
+            j = self.L[r]
+            while j != r:
+                self.uncover(C[j])
+                j = self.L[j]
+            chosen.pop()
+            if self.found >= self.limit:
+                break
+            r = D[r]
+        self.uncover(best)
+
+    def select_givens(self, cells):
+        # Covers the columns of every given. Returns the covered columns in
+        # order, or None (with nothing left covered) if two givens clash.
+        size = self.size
+        done = []
+        for cell, value in enumerate(cells):
+            if value == 0:
+                continue
+            node = self.row_node[cell * size + value - 1]
+            columns = [self.C[node]]
+            k = self.R[node]
+            while k != node:
+                columns.append(self.C[k])
+                k = self.R[k]
+            if any(self.covered[c] for c in columns):
+                self.release(done)
+                return None
+            for c in columns:
+                self.cover(c)
+                done.append(c)
+        return done
+
+    def release(self, done):
+        for c in reversed(done):
+            self.uncover(c)
+
+    def count(self, cells, limit=2):
+        self.limit = limit
+        self.found = 0
+        self.solution = None
+        if limit <= 0:
+            return 0
+        done = self.select_givens(cells)
+        if done is None:
+            return 0
+        self.search([])
+        self.release(done)
+        return self.found
+
+    def solve(self, cells):
+        if not self.count(cells, 1):
+            return None
+        return self.solution_cells(cells)
+
+    def has_other_solution(self, cells, cell, value):
+        # The digging question of BitmaskSolver.has_other_solution, asked by
+        # exact cover: does the puzzle have a solution with another value at
+        # `cell`? Values that clash with a given are rejected by
+        # select_givens before any search.
+        cells = bytearray(cells)
+        for other in range(1, self.size + 1):
+            if other != value:
+                cells[cell] = other
+                if self.count(cells, 1):
+                    return True
+        return False
+
+    def solution_cells(self, cells):
+        solution = bytearray(cells)
+        for node in self.solution:
+            cell, d = divmod(self.node_row[node], self.size)
+            solution[cell] = d + 1
+        return solution
+
+
+class InstrumentedDLXSolver(DLXSolver):
+    def __init__(self, geometry, stats):
+        super().__init__(geometry)
+        self.stats = stats
+
+    def search(self, chosen):
+        found = self.found
+        self.stats.enter()
+        super().search(chosen)
+        self.stats.leave(self.found > found)
@@ -0,0 +1,167 @@
+import itertools
+import math
+import random
+
+# Validity-preserving transforms for one box shape: relabel the values,
+# shuffle rows inside each band and the bands themselves, the same for
+# columns and stacks, and transpose when the boxes are square. Applied to a
+# puzzle with a unique solution they give another puzzle with a unique
+# solution (the transformed one) without any solving.
+
+
+def random_transform(geometry, rng=None):
+    rng = rng or random
+    size = geometry.size
+    band_height = geometry.subgrid_rows
+    stack_width = geometry.subgrid_cols
+    bands = list(range(size // band_height))
+    rng.shuffle(bands)
+    rows = [band * band_height + row for band in bands for row in rng.sample(range(band_height), band_height)]
+    stacks = list(range(size // stack_width))
+    rng.shuffle(stacks)
+    cols = [stack * stack_width + col for stack in stacks for col in rng.sample(range(stack_width), stack_width)]
+    if band_height == stack_width and rng.random() < 0.5:
+        order = [rows[j] * size + cols[i] for i in range(size) for j in range(size)]
+    else:
+        order = [row * size + col for row in rows for col in cols]
+    labels = list(range(1, size + 1))
+    rng.shuffle(labels)
+    table = bytes([0] + labels + list(range(size + 1, 256)))
+    return order, table
+
+
+def apply_transform(cells, transform):
+    # order[k] is the source cell of new cell k; table relabels the values.
+    order, table = transform
+    relabeled = bytes(cells).translate(table)
+    return bytes(relabeled[k] for k in order)
+
+
+def undo_transform(cells, transform):
+    order, table = transform
+    inverse = bytearray(256)
+    for value, label in enumerate(table):
+        inverse[label] = value
+    restored = bytearray(len(order))
+    for k, source in enumerate(order):
+        restored[source] = inverse[cells[k]]
+    return bytes(restored)
+
+
+def variant_count(geometry):
+    # Size of the transform group. Every variant of a seed is distinct unless
+    # the seed is symmetric under some of these transforms, which random
+    # puzzles almost never are.
+    size = geometry.size
+    bands = size // geometry.subgrid_rows
+    stacks = size // geometry.subgrid_cols
+    count = (math.factorial(size)
+             * math.factorial(geometry.subgrid_rows) ** bands * math.factorial(bands)
+             * math.factorial(geometry.subgrid_cols) ** stacks * math.factorial(stacks))
+    if geometry.subgrid_rows == geometry.subgrid_cols:
+        count *= 2
+    return count
+
+
+# Canonical form: the smallest relabeled grid over the transforms that put
+# bands, rows, stacks and columns in the order of label-free signatures
+# (how often each given's value occurs in the puzzle). The signatures are
+# invariant under the whole group, so equivalent puzzles get the same key;
+# only ties between signatures have to be searched. Boards with too many
+# ties (nearly empty ones) fall back to a relabel-only key, which is still
+# exact but misses geometric equivalents.
+MAX_CANONICAL_CANDIDATES = 2048
+CANONICAL_FULL = 0
+CANONICAL_RELABEL = 1
+
+
+def canonical_form(cells, geometry):
+    # Returns (key, transform); apply_transform(cells, transform) is the
+    # canonical grid and undo_transform maps canonical cells back.
+    size = geometry.size
+    frequency = [0] * (size + 1)
+    for value in cells:
+        frequency[value] += 1
+    frequency[0] = 0
+    weights = [frequency[value] for value in cells]
+    views = [False, True] if geometry.subgrid_rows == geometry.subgrid_cols else [False]
+    candidates = []
+    total = 0
+    for transpose in views:
+        if transpose:
+            source = [j * size + i for i in range(size) for j in range(size)]
+        else:
+            source = list(range(size * size))
+        row_orders = line_orders(weights, source, size, geometry.subgrid_rows, geometry.subgrid_cols, True)
+        col_orders = line_orders(weights, source, size, geometry.subgrid_cols, geometry.subgrid_rows, False)
+        if row_orders is None or col_orders is None:
+            total = math.inf
+            break
+        total += len(row_orders) * len(col_orders)
+        if total > MAX_CANONICAL_CANDIDATES:
+            break
+        candidates.append((source, row_orders, col_orders))
+    if total > MAX_CANONICAL_CANDIDATES:
+        canonical, table = relabeled(cells, range(size * size), size)
+        return bytes([size, CANONICAL_RELABEL]) + canonical, (list(range(size * size)), table)
+    best = None
+    for source, row_orders, col_orders in candidates:
+        for rows in row_orders:
+            for cols in col_orders:
+                order = [source[row * size + col] for row in rows for col in cols]
+                canonical, table = relabeled(cells, order, size)
+                if best is None or canonical < best[0]:
+                    best = (canonical, order, table)
+    canonical, order, table = best
+    return bytes([size, CANONICAL_FULL]) + canonical, (order, table)
+
+
+def relabeled(cells, order, size):
+    # Values are renumbered in order of first appearance; values missing
+    # from the puzzle take the remaining labels in their original order.
+    labels = [0] * (size + 1)
+    next_label = 1
+    canonical = bytearray(len(order))
+    for k, source in enumerate(order):
+        value = cells[source]
+        if value:
+            if not labels[value]:
+                labels[value] = next_label
+                next_label += 1
+            canonical[k] = labels[value]
+    for value in range(1, size + 1):
+        if not labels[value]:
+            labels[value] = next_label
+            next_label += 1
+    return bytes(canonical), bytes(labels + list(range(size + 1, 256)))
+
+
+def line_orders(weights, source, size, group, segment, rows):
+    # Every order of the rows (or columns) of the view that sorts groups of
+    # lines (bands or stacks), and lines within a group, by signature.
+    # Returns None when ties allow more than MAX_CANONICAL_CANDIDATES.
+    def weight(line, k):
+        return weights[source[line * size + k] if rows else source[k * size + line]]
+    signatures = [tuple(sorted(tuple(sorted(weight(line, start + k) for k in range(segment)))
+                               for start in range(0, size, segment)))
+                  for line in range(size)]
+    groups = [list(range(start, start + group)) for start in range(0, size, group)]
+    group_signatures = [tuple(sorted(signatures[line] for line in lines)) for lines in groups]
+    group_choices = tie_orders(range(len(groups)), group_signatures.__getitem__)
+    line_choices = [tie_orders(lines, signatures.__getitem__) for lines in groups]
+    if group_choices is None or None in line_choices:
+        return None
+    if len(group_choices) * math.prod(len(choices) for choices in line_choices) > MAX_CANONICAL_CANDIDATES:
+        return None
+    return [[line for lines in combination for line in lines]
+            for group_order in group_choices
+            for combination in itertools.product(*(line_choices[g] for g in group_order))]
+
+
+def tie_orders(items, key):
+    ordered = sorted(items, key=key)
+    ties = [list(tied) for _, tied in itertools.groupby(ordered, key=key)]
+    if math.prod(math.factorial(len(tied)) for tied in ties) > MAX_CANONICAL_CANDIDATES:
+        return None
+    return [[item for part in combination for item in part]
+            for combination in itertools.product(*(itertools.permutations(tied) for tied in ties))]
@@ -0,0 +1,35 @@
+import io
+import os
+import tempfile
+import unittest
+from sudoku_batch import solve_one, solve_stream
+
+PUZZLE = "53..7....6..195....98....6.8...6...34..8.3..17...2...6.6....28....419..5....8..79"
+SOLUTION = "534678912672195348198342567859761423426853791713924856961537284287419635345286179"
+
+
+class SolveStreamTest(unittest.TestCase):
+    def test_malformed_lines_become_errors(self):
+        # 25 and 49 cells have no box shape; 36x36 has no value symbols.
+        for text in ("1" * 25, "." * 49, "." * 36 * 36, "12", PUZZLE[:-1] + "X"):
+            self.assertTrue(solve_one(text).startswith("error: "), text[:10])
+
+    def test_one_line_per_puzzle_in_order(self):
+        lines = [PUZZLE, "1" * 25, "." * 49, "11" + PUZZLE[2:], PUZZLE]
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as file:
+            file.write("\n".join(lines) + "\n")
+        try:
+            for workers in (1, 2):
+                output = io.StringIO()
+                solved, failed = solve_stream(file.name, output, workers=workers)
+                results = output.getvalue().splitlines()
+                self.assertEqual((solved, failed), (2, 3))
+                self.assertEqual(results[0], SOLUTION)
+                self.assertEqual(results[4], SOLUTION)
+                self.assertTrue(all(line.startswith("error: ") for line in results[1:4]))
+        finally:
+            os.remove(file.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
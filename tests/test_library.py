@@ -0,0 +1,138 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+from sudoku_engine import SudokuBoard, CLUE_MAP, dig_puzzle
+from sudoku_library import PuzzleLibrary, HEADER, HEADER_SIZE, MAGIC, VERSION, import_text
+
+
+def make_entries(count, size=9, difficulty="Easy", seed=0):
+    entries = []
+    for k in range(count):
+        board = SudokuBoard(size)
+        dig_puzzle(board, CLUE_MAP[size][difficulty], random.Random(seed + k))
+        entries.append((size, difficulty, seed + k, board.snapshot(), board.solution))
+    return entries
+
+
+class LibraryTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "puzzles.sdkl")
+
+    def assert_matches(self, library, entries, numbers):
+        for number, (size, difficulty, seed, puzzle, solution) in zip(numbers, entries):
+            entry = library.entry(number)
+            self.assertEqual((entry.size, entry.difficulty, entry.seed), (size, difficulty, seed))
+            self.assertEqual((entry.puzzle, entry.solution), (puzzle, solution))
+
+    def test_round_trip(self):
+        easy = make_entries(5)
+        hard = make_entries(3, 6, "Hard", seed=100)
+        with PuzzleLibrary.create(self.path, 9) as library:
+            self.assertEqual(list(library.append(easy)), [0, 1, 2, 3, 4])
+            self.assertEqual(list(library.append(hard)), [5, 6, 7])
+        with PuzzleLibrary(self.path) as library:
+            self.assertEqual(len(library), 8)
+            self.assertEqual(library.counts(), {(6, "Hard"): 3, (9, "Easy"): 5})
+            self.assert_matches(library, easy + hard, range(8))
+            board = library.board(6)
+            self.assertEqual((board.size, board.snapshot(), board.solution), (6, hard[1][3], hard[1][4]))
+            self.assertIn(library.random_number(6, "Hard"), (5, 6, 7))
+            self.assertIsNone(library.random_number(9, "Hard"))
+
+        with PuzzleLibrary(self.path, writable=True) as library:
+            with self.assertRaises(IndexError):
+                library.remove([1, 99])
+            library.remove([1, 5])
+        with PuzzleLibrary(self.path) as library:
+            self.assertEqual(library.counts(), {(6, "Hard"): 2, (9, "Easy"): 4})
+            self.assertTrue(library.entry(1).deleted)
+            with self.assertRaises(IndexError):
+                library.board(1)
+            for _ in range(20):
+                self.assertIn(library.random_number(9, "Easy"), (0, 2, 3, 4))
+
+        with PuzzleLibrary(self.path, writable=True) as library:
+            library.append(easy[:2])
+            self.assertEqual(library.compact(), (7, 3))
+        with PuzzleLibrary(self.path) as library:
+            self.assertEqual(len(library), 7)
+            self.assert_matches(library, [easy[0]] + easy[2:] + hard[1:] + easy[1:2], range(7))
+
+    def test_import_checks_uniqueness(self):
+        unique = make_entries(1)[0]
+        solution = "".join(str(value) for value in unique[4])
+        puzzle = "".join(str(value) if value else "." for value in unique[3])
+        ambiguous = solution[:11] + "." * 70
+        with PuzzleLibrary.create(self.path, 9) as library:
+            self.assertEqual(import_text(library, [f"{puzzle} {solution}", f"{ambiguous} {solution}", "123"]), (1, 2))
+
+    def test_rejects_damaged_files(self):
+        with open(self.path, "wb") as file:
+            file.write(b"not a library" * 10)
+        with self.assertRaises(ValueError):
+            PuzzleLibrary(self.path)
+        with PuzzleLibrary.create(self.path, 9) as library:
+            library.append(make_entries(3))
+            header = HEADER.unpack_from(open(self.path, "rb").read(HEADER_SIZE))
+        size = os.path.getsize(self.path)
+        with open(self.path, "r+b") as file:
+            file.truncate(size - 2)
+        with self.assertRaises(ValueError):
+            PuzzleLibrary(self.path)
+        for count, index_offset in ((3, size + 100), (50, header[6]), (3, HEADER_SIZE)):
+            with open(self.path, "r+b") as file:
+                file.write(HEADER.pack(MAGIC, VERSION, 9, header[3], header[4], count, index_offset))
+            with self.assertRaises(ValueError):
+                PuzzleLibrary(self.path)
+
+    def test_interrupted_writes_keep_library_readable(self):
+        first = make_entries(4)
+        more = make_entries(6, seed=50)
+        # Interrupt the k-th write of an append and of a remove, for every
+        # k, and check that the file still opens with the old or the new
+        # contents, and that it can be written again.
+        for operation in ("append", "remove"):
+            for fail_at in range(8):
+                with PuzzleLibrary.create(self.path, 9) as library:
+                    library.append(first)
+                calls = []
+                real = PuzzleLibrary.write_at
+
+                def write_at(library, offset, data):
+                    calls.append(offset)
+                    if len(calls) > fail_at:
+                        raise KeyboardInterrupt
+                    real(library, offset, data)
+
+                library = PuzzleLibrary(self.path, writable=True)
+                with mock.patch.object(PuzzleLibrary, "write_at", write_at):
+                    try:
+                        if operation == "append":
+                            library.append(more)
+                        else:
+                            library.remove([2])
+                    except KeyboardInterrupt:
+                        pass
+                library.file.close()
+                with PuzzleLibrary(self.path, writable=True) as library:
+                    if operation == "append":
+                        self.assertIn(len(library), (4, 10))
+                        self.assert_matches(library, first + more, range(len(library)))
+                        self.assertEqual(sum(library.counts().values()), len(library))
+                    else:
+                        self.assertIn(library.counts()[(9, "Easy")], (3, 4))
+                        self.assert_matches(library, first, range(4))
+                    library.append(first[:1])
+                    library.remove([0])
+                with PuzzleLibrary(self.path) as library:
+                    self.assert_matches(library, first[:1], [len(library) - 1])
+                if len(calls) <= fail_at:
+                    break
+
+
+if __name__ == "__main__":
+    unittest.main()